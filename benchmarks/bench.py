@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks of Lounge Ripper. Runs on plain Linux without Kodi and without a disc drive: the Kodi modules
+are replaced by the stubs in benchmarks/stubs, makemkvcon, HandBrakeCLI, mkisofs and mkvmerge by the fakes in
+benchmarks/bin, which replay their output at high rates and create sparse files.
+
+    python3 benchmarks/bench.py                  all benchmarks
+    python3 benchmarks/bench.py copy scan        selected benchmarks
+    python3 benchmarks/bench.py --size 4096      copy/rip 4 GB per title
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH)
+BIN = os.path.join(BENCH, 'bin')
+sys.path[:0] = [os.path.join(BENCH, 'stubs'), ROOT]
+
+import xbmc
+import xbmcaddon
+import xbmcgui
+import xbmcvfs
+
+MB = 1024 * 1024
+
+
+class Workspace(object):
+    """
+    Temp, destination, VFS and profile folder of a benchmark run and the addon settings using them
+    """
+
+    def __init__(self, root, args):
+        self.root = root
+        self.args = args
+        self.temp = os.path.join(root, 'temp')
+        self.dest = os.path.join(root, 'dest')
+        self.profile = os.path.join(root, 'profile')
+        xbmcvfs.VFSROOT = os.path.join(root, 'vfs')
+        xbmcaddon.INFO['profile'] = self.profile + os.sep
+        os.environ.update({'BENCH_TITLES': str(args.titles), 'BENCH_TITLESIZE': str(args.size * MB),
+                           'BENCH_LINES': str(args.lines), 'BENCH_DELAY': '0'})
+
+    def reset(self, mode=1, **settings):
+        for folder in [self.temp, self.dest, self.profile, xbmcvfs.VFSROOT]:
+            shutil.rmtree(folder, ignore_errors=True)
+            os.makedirs(folder)
+        xbmcaddon.SETTINGS.clear()
+        xbmcaddon.SETTINGS.update({'makemkvcon': os.path.join(BIN, 'makemkvcon'),
+                                   'HandBrakeCLI': os.path.join(BIN, 'HandBrakeCLI'),
+                                   'mkisofs': os.path.join(BIN, 'mkisofs'),
+                                   'mkvmerge': os.path.join(BIN, 'mkvmerge'),
+                                   'tempfolder': self.temp, 'deltempfolder': 'true',
+                                   'nativelanguage': 'German (deu)', 'driveid': '0', 'eject': 'false',
+                                   'encoderjobs': '1', 'planner': 'false', 'selectedtitles': 'false',
+                                   'p1_enabled': 'true', 'p1_profilename': 'Benchmark', 'p1_basefolder': self.dest,
+                                   'p1_subfolder': 'true', 'p1_codec': '0', 'p1_resolution': '1',
+                                   'p1_quality': '1', 'p1_mintitlelength': '900', 'p1_mode': str(mode),
+                                   'p1_foreignaudio': 'false', 'p1_additionalhandbrakeargs': ''})
+        xbmcaddon.SETTINGS.update(settings)
+        xbmcgui.UPDATES[0] = 0
+
+    def ripper(self, mode=1, **settings):
+        self.reset(mode, **settings)
+        import default
+        ripper = default.LoungeRipper()
+        ripper.getUserProfiles()
+        return ripper
+
+    def sparse(self, file, size):
+        with open(file, 'wb') as f: f.truncate(size)
+
+
+def maxrss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def report(results, benchmark, metric, value, unit=''):
+    results.append({'benchmark': benchmark, 'metric': metric, 'value': value, 'unit': unit})
+    print('%-10s %-40s %14s %s' % (benchmark, metric, '%.2f' % value if isinstance(value, float) else value, unit))
+
+
+def benchPoll(ws, results):
+    #
+    # parse throughput of pollSubprocess and number of progress dialog updates, compared with the plain
+    # output rate of the fakes (process started and output discarded)
+    #
+    os.environ['BENCH_TITLES'] = '1'
+    os.environ['BENCH_TITLESIZE'] = '0'
+    source = os.path.join(ws.temp, 'source.mkv')
+    for name, argv in [('robot', ['makemkvcon', 'mkv', '-r', 'disc:0', 'all', ws.temp]),
+                       ('handbrake', ['HandBrakeCLI', '-i', source, '-o', source + '.out']),
+                       ('mkisofs', ['mkisofs', '-o', source + '.iso', ws.dest])]:
+        ripper = ws.ripper()
+        ws.sparse(source, MB)
+        path = os.path.join(BIN, argv[0])
+
+        started = time.perf_counter()
+        subprocess.run(argv, executable=path, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        plain = time.perf_counter() - started
+
+        started = time.perf_counter()
+        ripper.pollSubprocess(argv[0], path, ' '.join('"%s"' % arg for arg in argv))
+        polled = time.perf_counter() - started
+
+        report(results, 'poll', '%s: lines/s' % name, ws.args.lines / polled)
+        report(results, 'poll', '%s: parse overhead' % name, (polled - plain) * 1000, 'ms')
+        report(results, 'poll', '%s: progress updates' % name, xbmcgui.UPDATES[0])
+    os.environ['BENCH_TITLES'] = str(ws.args.titles)
+    os.environ['BENCH_TITLESIZE'] = str(ws.args.size * MB)
+
+
+def benchCopy(ws, results):
+    #
+    # throughput and memory of copies between local folders and to VFS destinations
+    #
+    for name in ['local', 'vfs']:
+        ripper = ws.ripper()
+        source = os.path.join(ws.temp, 'source.mkv')
+        ws.sparse(source, ws.args.size * MB)
+        tracemalloc.start()
+        rss = maxrss()
+        started = time.perf_counter()
+        if name == 'local':
+            ripper.localcopy(source, os.path.join(ws.dest, 'dest.mkv'), ripper.ProgressBG, 'Benchmark')
+        else:
+            ripper.streamcopy(source, xbmcvfs.SCHEME + 'dest.mkv', ripper.ProgressBG, 'Benchmark')
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        report(results, 'copy', '%s: throughput' % name, ws.args.size / elapsed, 'MB/s')
+        report(results, 'copy', '%s: peak python memory' % name, peak / MB, 'MB')
+        report(results, 'copy', '%s: max. RSS growth' % name, (maxrss() - rss) / MB, 'MB')
+
+
+def benchScan(ws, results):
+    #
+    # index of the temp folder and consumption of all files by buildDestFileAndFolder
+    #
+    ripper = ws.ripper()
+    for idx in range(ws.args.files):
+        ws.sparse(os.path.join(ws.temp, 'BENCH_DISC_t%04d.mkv' % idx), (idx + 1) * MB)
+    for idx in range(ws.args.files // 10):
+        ws.sparse(os.path.join(ws.temp, 'BENCH_DISC_t%04d.txt' % idx), MB)
+    ripper.process_all = True
+
+    started = time.perf_counter()
+    ripper.scanCandidates()
+    scanned = time.perf_counter() - started
+    count = 0
+    while True:
+        ripper.buildDestFileAndFolder()
+        if ripper.src is None: break
+        count += 1
+    elapsed = time.perf_counter() - started
+    report(results, 'scan', 'scan of %s files' % ws.args.files, scanned * 1000, 'ms')
+    report(results, 'scan', 'scan and build %s destinations' % count, elapsed * 1000, 'ms')
+
+
+def benchModes(ws, results):
+    #
+    # end to end wall time of all modes: rip only, rip and encode, encode only, backup (ISO)
+    #
+    for mode in [0, 1, 2, 3]:
+        ripper = ws.ripper(mode)
+        if mode == 2:
+            for idx in range(ws.args.titles):
+                ws.sparse(os.path.join(ws.temp, 'BENCH_DISC_t%02d.mkv' % idx), ws.args.size * MB)
+        started = time.perf_counter()
+        ripper.process()
+        elapsed = time.perf_counter() - started
+        report(results, 'modes', 'mode %s' % mode, elapsed, 's')
+
+    # rip and encode with stream rules (scan of every title) and chunked encoding
+    ripper = ws.ripper(1, p1_audiolangs='eng,deu', p1_sublangs='deu', chunkencode='true', chunkminlength='10',
+                       chunkjobs='2')
+    started = time.perf_counter()
+    ripper.process()
+    elapsed = time.perf_counter() - started
+    report(results, 'modes', 'mode 1, stream rules and chunks', elapsed, 's')
+
+
+BENCHMARKS = {'poll': benchPoll, 'copy': benchCopy, 'scan': benchScan, 'modes': benchModes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks of Lounge Ripper')
+    parser.add_argument('benchmarks', nargs='*', help='%s (default: all)' % ', '.join(BENCHMARKS))
+    parser.add_argument('--size', type=int, default=1024, help='size of a title/copied file in MB (default: 1024)')
+    parser.add_argument('--titles', type=int, default=3, help='titles of the fake disc (default: 3)')
+    parser.add_argument('--lines', type=int, default=100000,
+                        help='progress lines written by the fake tools (default: 100000)')
+    parser.add_argument('--files', type=int, default=1000, help='files in temp folder for scan (default: 1000)')
+    parser.add_argument('--workdir', help='folder for temp, destination and profile (default: system temp)')
+    parser.add_argument('--json', help='write the results into this file')
+    parser.add_argument('--verbose', action='store_true', help='show the log of the addon')
+    args = parser.parse_args()
+    for name in args.benchmarks:
+        if name not in BENCHMARKS: parser.error('unknown benchmark: %s' % name)
+
+    xbmc.VERBOSE = args.verbose
+    os.environ['PATH'] = BIN + os.pathsep + os.environ.get('PATH', '')
+    root = tempfile.mkdtemp(prefix='loungeripper-bench-', dir=args.workdir)
+    results = list()
+    try:
+        ws = Workspace(root, args)
+        for name in args.benchmarks or list(BENCHMARKS):
+            BENCHMARKS[name](ws, results)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f: json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Minimal stand-in of the Kodi xbmc module for the offline benchmarks
+"""
+import sys
+import time
+
+LOGDEBUG, LOGINFO, LOGWARNING, LOGERROR = 0, 1, 2, 3
+
+# print log messages to stderr (set by bench.py --verbose)
+VERBOSE = False
+
+
+def log(msg, level=LOGDEBUG):
+    if VERBOSE: sys.stderr.write('%s\n' % msg)
+
+
+def executebuiltin(function, wait=False):
+    log('executebuiltin: %s' % function)
+
+
+def sleep(ms):
+    time.sleep(ms / 1000.0)
+
+
+def getCondVisibility(condition):
+    return False
+
+
+def translatePath(path):
+    return path
+
+
+class Monitor(object):
+
+    def abortRequested(self):
+        return False
+
+    def waitForAbort(self, timeout=0):
+        time.sleep(timeout)
+        return False
+
+
+class Player(object):
+
+    def isPlaying(self):
+        return False
+
+    def isPlayingVideo(self):
+        return False
+
+
+class Keyboard(object):
+
+    def __init__(self, default='', heading=''):
+        self.text = default or 'Benchmark'
+
+    def doModal(self): pass
+
+    def isConfirmed(self):
+        return True
+
+    def getText(self):
+        return self.text
@@ -0,0 +1,39 @@
+"""
+Minimal stand-in of the Kodi xbmcaddon module for the offline benchmarks. Settings are taken from SETTINGS,
+localized strings from the English strings.po of the addon
+"""
+import os
+import re
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SETTINGS = dict()
+INFO = {'id': 'script.loungeripper', 'name': 'Lounge Ripper', 'path': ROOT, 'version': 'benchmark', 'profile': ''}
+
+
+def loadStrings():
+    strings = dict()
+    with open(os.path.join(ROOT, 'resources', 'language', 'English', 'strings.po'), 'r', encoding='utf-8') as po:
+        for id, text in re.findall(r'msgctxt "#(\d+)"\s+msgid "(.*)"', po.read()):
+            strings[int(id)] = text.replace('\\"', '"')
+    return strings
+
+
+STRINGS = loadStrings()
+
+
+class Addon(object):
+
+    def __init__(self, id=None): pass
+
+    def getAddonInfo(self, key):
+        return INFO[key]
+
+    def getSetting(self, key):
+        return str(SETTINGS.get(key, ''))
+
+    def setSetting(self, key, value):
+        SETTINGS[key] = value
+
+    def getLocalizedString(self, id):
+        return STRINGS.get(id, '')
@@ -0,0 +1,37 @@
+"""
+Minimal stand-in of the Kodi xbmcgui module for the offline benchmarks. Dialogs answer with the values of
+ANSWERS, progress updates are counted in UPDATES
+"""
+NOTIFICATION_INFO, NOTIFICATION_WARNING, NOTIFICATION_ERROR = 'info', 'warning', 'error'
+
+ANSWERS = {'select': 0, 'yesno': True}
+UPDATES = [0]
+
+
+class DialogProgressBG(object):
+
+    def create(self, heading, message=''): pass
+
+    def update(self, percent=0, heading='', message=''):
+        UPDATES[0] += 1
+
+    def close(self): pass
+
+    def isFinished(self):
+        return False
+
+
+class Dialog(object):
+
+    def select(self, heading, items, **kwargs):
+        return ANSWERS['select']
+
+    def yesno(self, heading, message, *args, **kwargs):
+        return ANSWERS['yesno']
+
+    def ok(self, heading, message):
+        return True
+
+    def notification(self, heading, message, icon=NOTIFICATION_INFO, time=5000, sound=True): pass
+
+    def textviewer(self, heading, text, usemono=False): pass
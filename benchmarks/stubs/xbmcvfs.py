@@ -0,0 +1,90 @@
+"""
+Minimal stand-in of the Kodi xbmcvfs module for the offline benchmarks. Paths with the scheme 'bench://'
+are mapped to the local folder VFSROOT, so the VFS code paths of the addon could be measured
+"""
+import os
+
+SCHEME = 'bench://'
+VFSROOT = '/tmp'
+
+
+def _local(path):
+    return os.path.join(VFSROOT, path[len(SCHEME):]) if path.startswith(SCHEME) else path
+
+
+def translatePath(path):
+    return path
+
+
+def exists(path):
+    return os.path.exists(_local(path))
+
+
+def mkdirs(path):
+    os.makedirs(_local(path), exist_ok=True)
+    return True
+
+
+def delete(path):
+    os.remove(_local(path))
+    return True
+
+
+def rmdir(path):
+    os.rmdir(_local(path))
+    return True
+
+
+def rename(source, dest):
+    os.rename(_local(source), _local(dest))
+    return True
+
+
+def listdir(path):
+    dirs, files = list(), list()
+    for entry in os.scandir(_local(path)):
+        (dirs if entry.is_dir() else files).append(entry.name)
+    return dirs, files
+
+
+class Stat(object):
+
+    def __init__(self, path):
+        self._stat = os.stat(_local(path))
+
+    def st_size(self):
+        return self._stat.st_size
+
+    def st_mtime(self):
+        return self._stat.st_mtime
+
+
+class File(object):
+
+    def __init__(self, path, mode='r'):
+        self._file = open(_local(path), 'wb' if mode == 'w' else 'rb')
+
+    def size(self):
+        return os.fstat(self._file.fileno()).st_size
+
+    def read(self, count=-1):
+        return self._file.read(count)
+
+    def readBytes(self, count=-1):
+        return self._file.read(count)
+
+    def write(self, buffer):
+        self._file.write(buffer)
+        return True
+
+    def seek(self, offset, whence=0):
+        return self._file.seek(offset, whence)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
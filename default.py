@@ -10,6 +10,17 @@ import xbmcaddon
 import xbmcvfs
 import traceback
 import shlex
+import threading
+import queue
+import json
+import uuid
+import csv
+import hashlib
+import signal
+import shutil
+import io
+import socket
+from concurrent.futures import ThreadPoolExecutor
 
 __addon__ = xbmcaddon.Addon()
 __addonID__ = __addon__.getAddonInfo('id')
@@ -17,6 +28,7 @@ __addonname__ = __addon__.getAddonInfo('name')
 __path__ = __addon__.getAddonInfo('path')
 __version__ = __addon__.getAddonInfo('version')
 __LS__ = __addon__.getLocalizedString
+__profile__ = xbmcvfs.translatePath(__addon__.getAddonInfo('profile'))
 
 # PREDEFINES
 
@@ -37,9 +49,82 @@ CODEC = ['H.264', 'H.265']
 # Encoding quality: High, Normal, Low
 QUALITY = ['-q 18', '-q 20', '-q 22', '-q 24', '-q 26']
 
+# Video encoders of HandBrakeCLI: software encoder and hardware encoders (preferred first) per codec
+SWENCODER = {'H.264': 'x264', 'H.265': 'x265'}
+HWENCODERS = {'H.264': ['nvenc_h264', 'qsv_h264', 'vce_h264', 'vaapi_h264', 'vt_h264', 'mf_h264'],
+              'H.265': ['nvenc_h265', 'qsv_h265', 'vce_h265', 'vaapi_h265', 'vt_h265', 'mf_h265']}
+# consecutive failures until a hardware encoder is disabled (a single failure could be caused by the source)
+ENCODERFAILURES = 3
+
 # foreign audiotracks
 ALLTRACKS = '-a 1,2,3,4,5,6,7,8,9,10'
 
+# Max. bytes per kernel side copy call (and progress update) while copying between local volumes
+COPYCHUNK = 64 * 1024 * 1024
+
+# Size and number of preallocated buffers while copying to network (VFS) destinations
+VFSCHUNK = 4 * 1024 * 1024
+VFSBUFFERS = 4
+
+# Verified copy: a partial destination of a previous attempt is continued at a multiple of RESUMESEGMENT bytes
+RESUMESEGMENT = 64 * 1024 * 1024
+
+# Max. latency (seconds) for abort checks while a subprocess is quiet and min. interval of progress updates
+POLLINTERVAL = 0.25
+UIINTERVAL = 1.0
+
+# Output lines of makemkvcon (robot mode), HandBrakeCLI, mkisofs and mkvmerge
+ROBOTLINE = re.compile(r'^([A-Z]+):(.*)$')
+ENCODINGLINE = re.compile(r'^Encoding: task \d+ of \d+, ([0-9.]+) %(?: \(([0-9.]+) fps, avg ([0-9.]+) fps)?')
+MKISOFSLINE = re.compile(r'^\s*([0-9.]+)% done')
+MKVMERGELINE = re.compile(r'^Progress: ([0-9]+)%')
+
+# MakeMKV robot attribute ids (apdefs.h) of disc (CINFO), titles (TINFO) and streams (SINFO) used by the disc model
+DISCATTRIBUTES = {2: 'name', 32: 'volume'}
+TITLEATTRIBUTES = {2: 'name', 8: 'chapters', 9: 'duration', 11: 'size', 16: 'source', 27: 'file'}
+STREAMATTRIBUTES = {1: 'type', 2: 'description', 3: 'lang', 6: 'codec', 14: 'channels'}
+
+# Number of discs kept in the cache of scanned discs
+DISCCACHESIZE = 50
+
+# Audio and subtitle tracks, chapters and duration of the sources (HandBrakeCLI --scan): track line within the
+# audio/subtitle section, chapter line within the chapter section
+SCANTRACK = re.compile(r'^\s+\+ (\d+), (.*?)(?: \(iso639-2: (\w+)\).*)?$')
+SCANCHAPTER = re.compile(r'^\s+\+ (\d+): duration (\d+:\d+:\d+)')
+SCANDURATION = re.compile(r'^\s+\+ duration: (\d+:\d+:\d+)')
+STREAMCACHESIZE = 200
+
+# Chunked encoding: chapter ranges per encoder slot (balances chapters of different length and slow workers)
+# and default port of the encoder workers (encodeworker.py)
+CHUNKSPERWORKER = 2
+WORKERPORT = 8766
+
+# Scheduler policy of the child processes: nice value and IO class/level (ionice) per priority of the profile
+# (normal, low, idle), Windows priority classes and the interval (seconds) the policy is applied to new threads
+PRIORITIES = [(0, None), (10, ('2', '7')), (19, ('3', None))]
+WINPRIORITIES = ['NORMAL_PRIORITY_CLASS', 'BELOW_NORMAL_PRIORITY_CLASS', 'IDLE_PRIORITY_CLASS']
+POLICYINTERVAL = 10
+
+# Concurrent delete operations while cleaning up VFS (network) folders
+CLEANUPWORKERS = 8
+
+# Planner: encoded bytes/s at quality '-q 20' per resolution (MAXDIM), factors per quality (QUALITY) and
+# codec (CODEC), encoding speed (x realtime) per resolution and codec, bytes/s of sources with unknown duration
+ENCODEDRATE = [2500000, 750000, 400000, 200000, 180000]
+QUALITYFACTOR = [1.5, 1.0, 0.75, 0.55, 0.4]
+CODECFACTOR = [1.0, 0.6]
+ENCODESPEED = [0.5, 2.0, 4.0, 8.0, 8.0]
+CODECSPEED = [1.0, 0.4]
+SOURCERATE = 4000000
+
+# Planner: throughput (bytes/s) of rip, mkisofs and copy
+RIPRATE = 20 * 1024 * 1024
+ISORATE = 100 * 1024 * 1024
+COPYRATE = 80 * 1024 * 1024
+
+# Weight of older runs in the throughput statistics (exponential moving average)
+STATSDECAY = 0.8
+
 # Converts filesizes to a human readable format (e.g. 123456 bytes to 123.4 KBytes)
 
 
@@ -56,11 +141,498 @@ def parsePath(path):
     :param path: Posix or Windows Path
     :return: Path created with os.path.join for both notations (Windows/Posix) using for subprocess calls
     """
-    while path[-1] == '\\': path = path[:-1]
+    while path and path[-1] == '\\': path = path[:-1]
     if OS == 'Windows': return os.path.join(*(path.split(os.sep))).replace(':', ':\\')
     return path
 
 
+def parseEvent(line):
+    """
+    :param line: output line of makemkvcon (robot mode), HandBrakeCLI, mkisofs or mkvmerge
+    :return: tuple of event (e.g. PRGV, PRGC, MSG, DRV, Encoding, ISO, Merge) and list of values, (None, None) if unknown
+    """
+    match = ROBOTLINE.match(line)
+    if match: return match.group(1), next(csv.reader([match.group(2)]))
+    match = ENCODINGLINE.match(line)
+    if match: return 'Encoding', list(match.groups())
+    match = MKISOFSLINE.match(line)
+    if match: return 'ISO', list(match.groups())
+    match = MKVMERGELINE.match(line)
+    if match: return 'Merge', list(match.groups())
+    return None, None
+
+
+def toSeconds(duration):
+    """
+    :param duration: duration as h:mm:ss
+    :return: duration in seconds
+    """
+    seconds = 0
+    for part in duration.split(':'): seconds = seconds * 60 + int(part)
+    return seconds
+
+
+def folderSize(folder):
+    """
+    :param folder: local folder
+    :return: size of all files in folder and its subfolders
+    """
+    size = 0
+    for root, dirs, files in os.walk(folder):
+        for file in files: size += os.path.getsize(os.path.join(root, file))
+    return size
+
+
+def isLocal(path):
+    """
+    :param path: path or VFS url (smb://, nfs://, ...)
+    :return: True if path is a local path which could accessed by the os module
+    """
+    return '://' not in path
+
+
+def sameDevice(source, dest):
+    """
+    :param source: existing local file
+    :param dest: local destination file, the folder has to exist
+    :return: True if source and destination are on the same filesystem (rename/link is possible)
+    """
+    try:
+        return os.stat(source).st_dev == os.stat(os.path.dirname(dest)).st_dev
+    except OSError:
+        return False
+
+
+def reloadSettings():
+    """
+    An instance of xbmcaddon.Addon keeps the settings of the time it was created, long running callers (autorun
+    service) reload the settings before they use them
+    :return: new instance of the addon, also used by LoungeRipper from now on
+    """
+    global __addon__
+    __addon__ = xbmcaddon.Addon()
+    return __addon__
+
+
+def parseCPUs(cpus):
+    """
+    :param cpus: list of CPU numbers and ranges, e.g. '0,2-5'
+    :return: set of CPU numbers, empty if all CPUs are used or the list is invalid
+    """
+    _cpus = set()
+    for part in re.findall(r'\d+(?:\s*-\s*\d+)?', cpus or ''):
+        first, _, last = part.replace(' ', '').partition('-')
+        _cpus.update(range(int(first), int(last or first) + 1))
+    return _cpus
+
+
+class MultiProgress(object):
+    """
+    Aggregates the progress of concurrent jobs into a single DialogProgressBG. Every job gets a proxy
+    with the interface of DialogProgressBG (create, update, close) which could passed to pollSubprocess/copyfile.
+    The dialog could be a job of another MultiProgress (e.g. the chunks of a single encoder job). If the total
+    number of work items (files, titles, chunks) is known, the progress is weighted by it, so the bar doesn't jump
+    backwards when the next item is started
+    """
+
+    class Job(object):
+
+        def __init__(self, parent, name):
+            self.parent = parent
+            self.name = name
+
+        def create(self, heading, message=''):
+            self.parent.set(self.name, 0, message)
+
+        def update(self, percent=0, heading='', message=''):
+            self.parent.set(self.name, percent, message)
+
+        def close(self):
+            self.parent.remove(self.name)
+
+        def add(self, count=1):
+            self.parent.add(count)
+
+        def finish(self):
+            self.parent.finish(self.name)
+
+    def __init__(self, header, dialog=None, total=0):
+        self.header = header
+        self.dialog = xbmcgui.DialogProgressBG() if dialog is None else dialog
+        self.total = total
+        self.finished = 0
+        self.jobs = dict()
+        self.active = False
+        self.lock = threading.Lock()
+
+    def job(self, name):
+        return self.Job(self, name)
+
+    def set(self, name, percent, message):
+        with self.lock:
+            self.jobs[name] = (int(percent), message)
+            _percent = self.percent()
+            _message = ', '.join('%s: %s%%' % (job, self.jobs[job][0]) for job in sorted(self.jobs))
+            if not self.active:
+                self.dialog.create('%s - %s' % (__addonname__, self.header), _message)
+                self.active = True
+            self.dialog.update(_percent, '%s - %s (%s)' % (__addonname__, self.header, len(self.jobs)), _message)
+
+    def percent(self):
+        _running = sum(job[0] for job in self.jobs.values())
+        if not self.total: return _running // len(self.jobs) if self.jobs else 0
+        return min(100, (100 * self.finished + _running) // max(self.total, self.finished + len(self.jobs)))
+
+    def add(self, count=1):
+        with self.lock:
+            self.total += count
+
+    def finish(self, name):
+        """
+        A work item of job name is completed
+        """
+        with self.lock:
+            self.finished += 1
+            self.jobs.pop(name, None)
+
+    def remove(self, name):
+        with self.lock:
+            self.jobs.pop(name, None)
+
+    def close(self):
+        with self.lock:
+            if self.active: self.dialog.close()
+            self.active = False
+
+
+class JobJournal(object):
+    """
+    Append only journal (JSON lines) of all jobs and the stage they have reached (rip, iso, encode, copy, done).
+    The last record of a job wins, jobs which are not 'done' are unfinished and could resumed after a restart
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.lock = threading.Lock()
+
+    def jobs(self):
+        _jobs = dict()
+        if not os.path.exists(self.file): return _jobs
+        with self.lock, open(self.file, 'r', encoding='utf-8') as journal:
+            for line in journal:
+                try:
+                    job = json.loads(line)
+                    _jobs[job['id']] = job
+                except (ValueError, KeyError):
+                    # last line could be incomplete if the system goes down while writing
+                    continue
+        return _jobs
+
+    def pending(self):
+        return [job for job in self.jobs().values() if job['stage'] != 'done']
+
+    def write(self, job):
+        with self.lock:
+            if not os.path.exists(os.path.dirname(self.file)): os.makedirs(os.path.dirname(self.file))
+            with open(self.file, 'a', encoding='utf-8') as journal:
+                journal.write(json.dumps(job) + '\n')
+                journal.flush()
+                os.fsync(journal.fileno())
+
+    def purge(self):
+        #
+        # the journal is only needed as long as there are unfinished jobs
+        #
+        if os.path.exists(self.file) and not self.pending():
+            with self.lock: os.remove(self.file)
+
+
+class ProcessRegistry(object):
+    """
+    PID file of all child processes (makemkvcon, HandBrakeCLI, mkisofs) started by the addon, survives restarts
+    of the addon so orphaned processes could found and killed by their exact PID
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.lock = threading.Lock()
+
+    def read(self):
+        if not os.path.exists(self.file): return dict()
+        try:
+            with open(self.file, 'r', encoding='utf-8') as pidfile: return json.load(pidfile)
+        except ValueError:
+            return dict()
+
+    def update(self, pid, process=None):
+        with self.lock:
+            _processes = self.read()
+            if process is None: _processes.pop(str(pid), None)
+            else: _processes[str(pid)] = process
+            if not os.path.exists(os.path.dirname(self.file)): os.makedirs(os.path.dirname(self.file))
+            with open(self.file, 'w', encoding='utf-8') as pidfile: json.dump(_processes, pidfile)
+
+    def add(self, pid, process):
+        self.update(pid, process)
+
+    def remove(self, pid):
+        self.update(pid)
+
+
+class Statistics(object):
+    """
+    Throughput statistics of previous runs (rip per drive, encoding per codec/resolution/quality, mkisofs,
+    copy per destination). Bytes and seconds are kept as moving sums, so recent runs count more
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.lock = threading.Lock()
+
+    def read(self):
+        if not os.path.exists(self.file): return dict()
+        try:
+            with open(self.file, 'r', encoding='utf-8') as stats: return json.load(stats)
+        except ValueError:
+            return dict()
+
+    def record(self, stage, key, size, seconds, **kwargs):
+        if size <= 0 or seconds <= 0: return
+        with self.lock:
+            _stats = self.read()
+            entry = _stats.setdefault(stage, dict()).setdefault(key, {'bytes': 0, 'seconds': 0, 'runs': 0})
+            entry['bytes'] = entry['bytes'] * STATSDECAY + size
+            entry['seconds'] = entry['seconds'] * STATSDECAY + seconds
+            entry['runs'] += 1
+            entry.update(kwargs)
+            if not os.path.exists(os.path.dirname(self.file)): os.makedirs(os.path.dirname(self.file))
+            with open(self.file, 'w', encoding='utf-8') as stats: json.dump(_stats, stats)
+
+    def rate(self, stage, key, default=None):
+        """
+        :return: measured throughput in bytes/s of stage/key, default if there are no measurements
+        """
+        entry = self.read().get(stage, dict()).get(key)
+        if not entry or entry['seconds'] <= 0: return default
+        return entry['bytes'] / entry['seconds']
+
+
+class EncoderCache(object):
+    """
+    Video encoders reported by 'HandBrakeCLI --help', cached per executable as long as the executable isn't
+    changed (size, modification time). Hardware encoders which have failed ENCODERFAILURES times in a row are
+    disabled in the cache
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.lock = threading.Lock()
+
+    def read(self):
+        if not os.path.exists(self.file): return dict()
+        try:
+            with open(self.file, 'r', encoding='utf-8') as cache: return json.load(cache)
+        except ValueError:
+            return dict()
+
+    def write(self, cache):
+        if not os.path.exists(os.path.dirname(self.file)): os.makedirs(os.path.dirname(self.file))
+        with open(self.file, 'w', encoding='utf-8') as f: json.dump(cache, f)
+
+    @staticmethod
+    def probe(executable):
+        """
+        :return: list of encoders from the encoder option of the help text
+        """
+        _help = subprocess.run([executable, '--help'], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               encoding='utf-8', errors='replace', timeout=60).stdout
+        encoders = list()
+        _options = False
+        for line in _help.splitlines():
+            if re.match(r'^\s*-e, --encoder', line):
+                _options = True
+            elif _options:
+                match = re.match(r'^\s{8,}([a-z0-9_]+)\s*$', line)
+                if not match:
+                    if encoders: break
+                    continue
+                encoders.append(match.group(1))
+        return encoders
+
+    def encoders(self, executable):
+        """
+        :return: available (and not disabled) encoders of executable
+        """
+        _stat = os.stat(executable)
+        _id = '%s:%s' % (_stat.st_size, int(_stat.st_mtime))
+        with self.lock:
+            cache = self.read()
+            entry = cache.get(executable)
+            if entry is None or entry['id'] != _id:
+                entry = {'id': _id, 'encoders': self.probe(executable), 'disabled': []}
+                cache[executable] = entry
+                self.write(cache)
+        return [encoder for encoder in entry['encoders'] if encoder not in entry['disabled']]
+
+    def failed(self, executable, encoder, success=False):
+        """
+        Counts the consecutive failures of encoder, a success resets the counter
+        :return: True if the encoder is disabled now
+        """
+        with self.lock:
+            cache = self.read()
+            if executable not in cache: return False
+            failures = cache[executable].setdefault('failures', dict())
+            if success:
+                if not failures.pop(encoder, None): return False
+            else:
+                failures[encoder] = failures.get(encoder, 0) + 1
+                if failures[encoder] >= ENCODERFAILURES and encoder not in cache[executable]['disabled']:
+                    cache[executable]['disabled'].append(encoder)
+            self.write(cache)
+            return encoder in cache[executable]['disabled']
+
+
+class ProcessPolicy(object):
+    """
+    Scheduler policy of the child processes (makemkvcon, HandBrakeCLI, mkisofs, mkvmerge) of a profile: priority
+    (nice value and IO class), CPU affinity and the behaviour while Kodi plays (0: none, 1: throttle to idle IO
+    on a single CPU, 2: pause with SIGSTOP/SIGCONT). Affinity and throttling need Linux, elsewhere throttling
+    falls back to pause. On Windows only the priority is available (priority class of the new process)
+    """
+
+    def __init__(self, priority=0, cpus=None, playback=0):
+        self.priority = priority
+        self.cpus = cpus or set()
+        self.playback = playback
+        self.affinity = hasattr(os, 'sched_setaffinity')
+        self.ionice = shutil.which('ionice') if OS == 'Linux' else None
+        if OS == 'Windows':
+            self.playback = 0
+        elif self.playback == 1 and not self.affinity:
+            self.playback = 2
+
+    def creationflags(self):
+        return getattr(subprocess, WINPRIORITIES[self.priority], 0) if OS == 'Windows' else 0
+
+    @staticmethod
+    def tasks(pid):
+        #
+        # Linux: nice value, IO priority and affinity are attributes of the threads, so all threads are changed
+        #
+        try:
+            return [int(task) for task in os.listdir('/proc/%s/task' % pid)]
+        except OSError:
+            return [pid]
+
+    def apply(self, pid, throttled=False, io=True):
+        """
+        Sets priority and affinity of process pid. The nice value is only raised (unprivileged users can't lower it),
+        throttling changes IO class and affinity which could restored
+        :param io: set the IO class too (new threads inherit it, so it's needed only at start and on changes)
+        """
+        if OS == 'Windows': return
+        nice, ioclass = PRIORITIES[self.priority]
+        if throttled: ioclass = PRIORITIES[-1][1]
+        cpus = self.cpus
+        if throttled and self.affinity: cpus = {max(self.cpus or os.sched_getaffinity(0))}
+        for task in self.tasks(pid):
+            try:
+                if nice > 0 and os.getpriority(os.PRIO_PROCESS, task) < nice:
+                    os.setpriority(os.PRIO_PROCESS, task, nice)
+                if self.affinity and (cpus or self.playback == 1):
+                    os.sched_setaffinity(task, cpus or os.sched_getaffinity(0))
+                if io and self.ionice and (ioclass or self.playback == 1):
+                    _ioclass = ioclass or ('2', '4')
+                    subprocess.call([self.ionice, '-c', _ioclass[0]] + (['-n', _ioclass[1]] if _ioclass[1] else []) +
+                                    ['-p', str(task)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            except (OSError, ValueError):
+                pass
+
+    @staticmethod
+    def pause(pid, paused=True):
+        try:
+            os.kill(pid, signal.SIGSTOP if paused else signal.SIGCONT)
+        except OSError:
+            pass
+
+
+class Span(object):
+    """
+    Timing of a single stage (info list, rip, mkisofs, encode, copy, cleanup), used as context manager.
+    Additional values (bytes, exit code) are added with set(), errors are recorded on exit
+    """
+
+    def __init__(self, metrics, stage, **kwargs):
+        self.metrics = metrics
+        self.record = {'run': metrics.run, 'stage': stage, 'thread': threading.current_thread().name}
+        self.record.update(kwargs)
+
+    def set(self, **kwargs):
+        self.record.update(kwargs)
+
+    def __enter__(self):
+        self.record['start'] = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.record['seconds'] = round(time.perf_counter() - self._started, 3)
+        if exc_type is not None: self.record['error'] = exc_type.__name__
+        self.metrics.write(self.record)
+        return False
+
+
+class NoSpan(object):
+    """
+    Span if metrics are disabled, does nothing
+    """
+
+    def set(self, **kwargs): pass
+
+    def __enter__(self): return self
+
+    def __exit__(self, exc_type, exc_value, tb): return False
+
+
+NOSPAN = NoSpan()
+
+
+class Metrics(object):
+    """
+    Spans of all stages of a run as JSON lines (metrics.jsonl), only written if enabled in settings
+    """
+
+    def __init__(self, file, enabled=False):
+        self.file = file
+        self.enabled = enabled
+        self.run = uuid.uuid4().hex[:8]
+        self.spans = list()
+        self.lock = threading.Lock()
+
+    def span(self, stage, **kwargs):
+        if not self.enabled: return NOSPAN
+        return Span(self, stage, **kwargs)
+
+    def write(self, record):
+        with self.lock:
+            self.spans.append(record)
+            if not os.path.exists(os.path.dirname(self.file)): os.makedirs(os.path.dirname(self.file))
+            with open(self.file, 'a', encoding='utf-8') as metrics: metrics.write(json.dumps(record) + '\n')
+
+    def summary(self):
+        """
+        :return: list of (stage, count, seconds, bytes) of all spans of this run
+        """
+        _stages = dict()
+        for record in self.spans:
+            _stage = _stages.setdefault(record['stage'], [0, 0, 0])
+            _stage[0] += 1
+            _stage[1] += record['seconds']
+            _stage[2] += record.get('bytes') or 0
+        return [(stage, values[0], values[1], values[2]) for stage, values in _stages.items()]
+
+
 class LoungeRipper(object):
 
     class NoProfileEnabledException(Exception): pass
@@ -77,34 +649,66 @@ class LoungeRipper(object):
     class CleanUpTempFolderException(Exception): pass
     class CouldNotFindValidFilesException(Exception): pass
     class CurrentProcessAbortedException(Exception): pass
+    class ResumeJobsCompletedException(Exception): pass
+    class NotEnoughDiskSpaceException(Exception): pass
+    class ShowStatisticsCalledException(Exception): pass
     class UnexpectedGlobalError(Exception): pass
 
     def __init__(self):
 
         self.src = None
+        self.srcpath = None
         self.tmp = None
         self.destfolder = None
         self.destfile = None
         self.title = None
+        self.disc = None
+        self.drives = dict()
+        self.candidates = None
+        self.srcsize = 0
         self.extensions = ['.mkv', '.ts', '.m2ts', '.mp4', '.mpg', '.mpeg', '.avi', '.flv', '.wmv',
                            '.264', '.mov', '.iso']
         self.task = None
         self.process_all = None
         self.lastmessage = None
+        self.job = None
+        self.resumed = None
+        self.unattended = False
+        self.sources = None
+        self.journal = JobJournal(os.path.join(__profile__, 'jobs.jsonl'))
+        self.registry = ProcessRegistry(os.path.join(__profile__, 'processes.json'))
+        self.stats = Statistics(os.path.join(__profile__, 'stats.json'))
+        self.encodercache = EncoderCache(os.path.join(__profile__, 'encoders.json'))
+        self.streamlock = threading.Lock()
+        self.disclock = threading.RLock()
+        self.metrics = Metrics(os.path.join(__profile__, 'metrics.jsonl'),
+                               enabled=True if __addon__.getSetting('metrics').upper() == 'TRUE' else False)
 
         # Profile settings
 
         self.profile = None
         self.ripper = None
-        self.encoder = None
         self.mkiso = None
         self.mediacheck = None
+        self.policy = ProcessPolicy()
 
         # Other
 
         self.ProgressBG = xbmcgui.DialogProgressBG()
         self.Dialog = xbmcgui.Dialog()
         self.Monitor = xbmc.Monitor()
+        self.Player = xbmc.Player()
+        self.outputhandlers = {'PRGC': self.onProgressTitle,
+                               'PRGT': self.onProgressTitle,
+                               'PRGV': self.onProgressValue,
+                               'CINFO': self.onDiscInfo,
+                               'TINFO': self.onTitleInfo,
+                               'SINFO': self.onStreamInfo,
+                               'DRV': self.onDrive,
+                               'MSG': self.onMessage,
+                               'Encoding': self.onEncoding,
+                               'ISO': self.onIsoProgress,
+                               'Merge': self.onMergeProgress}
 
         # Settings
 
@@ -114,6 +718,8 @@ class LoungeRipper(object):
         self.encoder_path = parsePath(__addon__.getSetting('HandBrakeCLI'))
         self.mkisofs_executable = os.path.basename(__addon__.getSetting('mkisofs'))
         self.mkisofs_path = parsePath(__addon__.getSetting('mkisofs'))
+        self.mkvmerge_executable = os.path.basename(__addon__.getSetting('mkvmerge'))
+        self.mkvmerge_path = parsePath(__addon__.getSetting('mkvmerge'))
 
         self.tempfolder = parsePath(__addon__.getSetting('tempfolder'))
         self.del_tf = True if __addon__.getSetting('deltempfolder').upper() == 'TRUE' else False
@@ -125,17 +731,37 @@ class LoungeRipper(object):
         self.updatelib = True if __addon__.getSetting('updatelib').upper() == 'TRUE' else False
         self.driveid = __addon__.getSetting('driveid')
         self.eject = True if __addon__.getSetting('eject').upper() == 'TRUE' else False
+        self.pipeline = True if __addon__.getSetting('pipeline').upper() == 'TRUE' else False
+        self.nextdisc = True if __addon__.getSetting('nextdisc').upper() == 'TRUE' else False
+        self.directoutput = True if __addon__.getSetting('directoutput').upper() == 'TRUE' else False
+        self.selectedtitles = True if __addon__.getSetting('selectedtitles').upper() == 'TRUE' else False
+        self.planner = True if __addon__.getSetting('planner').upper() == 'TRUE' else False
+        self.verifycopy = True if __addon__.getSetting('verifycopy').upper() == 'TRUE' else False
+        self.multidrive = True if __addon__.getSetting('multidrive').upper() == 'TRUE' else False
+        self.encoderjobs = max(1, int(__addon__.getSetting('encoderjobs') or 1))
+        self.encoderpreset = __addon__.getSetting('encoderpreset')
+        self.encoderthreads = int(__addon__.getSetting('encoderthreads') or 0)
+        self.chunkencode = True if __addon__.getSetting('chunkencode').upper() == 'TRUE' else False
+        self.chunkminlength = int(__addon__.getSetting('chunkminlength') or 60) * 60
+        self.chunkjobs = max(1, int(__addon__.getSetting('chunkjobs') or 1))
+        self.encodeworkers = list()
+        for worker in re.split(r'[,;\s]+', __addon__.getSetting('encodeworkers').strip()):
+            if not worker: continue
+            host, _, port = worker.rpartition(':') if ':' in worker else (worker, '', '')
+            self.encodeworkers.append((host, int(port) if port.isdigit() else WORKERPORT))
 
     def getUserProfiles(self):
         _profiles = list()
-        if self.getProcessPID(self.ripper_executable) or self.getProcessPID(self.encoder_executable) or \
-                self.getProcessPID(self.mkisofs_executable):
+        _running = self.getProcessPIDs()
+        if _running:
             _profiles.append(__LS__(30038))
         else:
             for _profile in ['p1_', 'p2_', 'p3_', 'p4_', 'p5_', 'p6_', 'p7_']:
                 if __addon__.getSetting(_profile + 'enabled') == 'true':
                     _profiles.append(__addon__.getSetting(_profile + 'profilename'))
             if xbmcvfs.exists(self.tempfolder) and self.checkTempFolder(): _profiles.append(__LS__(30039))
+            if self.journal.pending(): _profiles.append(__LS__(30205))
+            if self.stats.read(): _profiles.append(__LS__(30215))
         if not _profiles:
             raise self.NoProfileEnabledException()
 
@@ -145,40 +771,137 @@ class LoungeRipper(object):
 
         self.profile = {}
         for _profile in ['p1_', 'p2_', 'p3_', 'p4_', 'p5_', 'p6_', 'p7_']:
-            if __addon__.getSetting(_profile + 'profilename') == _profiles[_idx]:
-                self.task = _profiles[_idx]
-                self.profile['basefolder'] = parsePath(__addon__.getSetting(_profile + 'basefolder'))
-                self.profile['subfolder'] = True if __addon__.getSetting(_profile + 'subfolder').upper() == 'TRUE' else False
-                self.profile['codec'] = CODEC[int(__addon__.getSetting(_profile + 'codec'))]
-                self.profile['resolution'] = MAXDIM[int(__addon__.getSetting(_profile + 'resolution'))]
-                self.profile['quality'] = QUALITY[int(__addon__.getSetting(_profile + 'quality'))]
-                self.profile['mintitlelength'] = int(re.match('\d+', __addon__.getSetting(_profile + 'mintitlelength')).group())
-                self.profile['mode'] = int(__addon__.getSetting(_profile + 'mode'))
-                self.profile['foreignaudio'] = ALLTRACKS if __addon__.getSetting(_profile + 'foreignaudio').upper() == 'TRUE' else ''
-                self.profile['additionalhandbrakeargs'] = __addon__.getSetting(_profile + 'additionalhandbrakeargs')
+            if __addon__.getSetting(_profile + 'profilename') == _profiles[_idx]: self.getProfile(_profile)
 
         if _profiles[_idx] == __LS__(30038):
-            _procpid = self.getProcessPID(self.ripper_executable)
-            if _procpid:
-                self.notifyLog('Killing ripper process with PID %s' % _procpid)
-                self.killProcessPID(_procpid, process=self.ripper_executable)
-            _procpid = self.getProcessPID(self.encoder_executable)
-            if _procpid:
-                self.notifyLog('Killing encoder process with PID %s' % _procpid)
-                self.killProcessPID(_procpid, process=self.encoder_executable)
-            _procpid = self.getProcessPID(self.mkisofs_executable)
-            if _procpid:
-                self.notifyLog('Killing mkisofs process with PID %s' % _procpid)
-                self.killProcessPID(_procpid, process=self.mkisofs_executable)
+            for _procpid, _process in _running.items():
+                self.notifyLog('Killing %s process with PID %s' % (_process, _procpid))
+                self.killProcessPID(_procpid, process=_process)
+                self.registry.remove(_procpid)
             raise self.KillCurrentProcessCalledException()
 
         if _profiles[_idx] == __LS__(30039):
             self.rmdirs(self.tempfolder, force=True)
+            # unfinished jobs couldn't resumed without their temp files
+            for job in self.journal.pending(): self.setStage(job, 'done')
+            self.journal.purge()
             raise self.CleanUpTempFolderException()
 
+        if _profiles[_idx] == __LS__(30205):
+            self.resumeJobs()
+            raise self.ResumeJobsCompletedException()
+
+        if _profiles[_idx] == __LS__(30215):
+            self.showStatistics()
+            raise self.ShowStatisticsCalledException()
+
+    def getProfile(self, _profile):
+        #
+        # settings of profile [_profile] (p1_ ... p7_)
+        #
+        self.task = __addon__.getSetting(_profile + 'profilename')
+        self.profile = {}
+        self.profile['basefolder'] = parsePath(__addon__.getSetting(_profile + 'basefolder'))
+        self.profile['subfolder'] = True if __addon__.getSetting(_profile + 'subfolder').upper() == 'TRUE' else False
+        self.profile['codec'] = CODEC[int(__addon__.getSetting(_profile + 'codec'))]
+        self.profile['resolution'] = MAXDIM[int(__addon__.getSetting(_profile + 'resolution'))]
+        self.profile['quality'] = QUALITY[int(__addon__.getSetting(_profile + 'quality'))]
+        self.profile['mintitlelength'] = int(re.match('\d+', __addon__.getSetting(_profile + 'mintitlelength')).group())
+        self.profile['mode'] = int(__addon__.getSetting(_profile + 'mode'))
+        self.profile['foreignaudio'] = ALLTRACKS if __addon__.getSetting(_profile + 'foreignaudio').upper() == 'TRUE' else ''
+        self.profile['additionalhandbrakeargs'] = __addon__.getSetting(_profile + 'additionalhandbrakeargs')
+        self.profile['hwencoder'] = True if __addon__.getSetting(_profile + 'encoder') == '1' else False
+        self.profile['encoderpreset'] = __addon__.getSetting(_profile + 'encoderpreset') or self.encoderpreset
+        self.profile['audiolangs'] = re.findall(r'[a-z]{3}', __addon__.getSetting(_profile + 'audiolangs').lower())
+        self.profile['audiotracks'] = int(__addon__.getSetting(_profile + 'audiotracks') or 2)
+        self.profile['nocommentary'] = False if __addon__.getSetting(_profile + 'nocommentary').upper() == 'FALSE' else True
+        self.profile['audiopassthru'] = True if __addon__.getSetting(_profile + 'audiopassthru').upper() == 'TRUE' else False
+        self.profile['sublangs'] = re.findall(r'[a-z]{3}', __addon__.getSetting(_profile + 'sublangs').lower())
+        self.profile['encoderthreads'] = int(__addon__.getSetting(_profile + 'encoderthreads') or 0) or self.encoderthreads
+        self.profile['priority'] = int(__addon__.getSetting(_profile + 'priority') or 0)
+        self.profile['cpus'] = sorted(parseCPUs(__addon__.getSetting(_profile + 'cpus')))
+        self.profile['playback'] = int(__addon__.getSetting(_profile + 'playback') or 0)
+        self.policy = self.getPolicy()
+
+    def getPolicy(self):
+        #
+        # process policy of the profile, also of profiles restored from the journal
+        #
+        return ProcessPolicy(priority=self.profile.get('priority', 0), cpus=set(self.profile.get('cpus', [])),
+                             playback=self.profile.get('playback', 0))
+
+    def confirm(self, message, default):
+        #
+        # yes/no question to the user, without user (autorun service) the default is the answer
+        #
+        if self.unattended: return default
+        return self.Dialog.yesno(__addonname__, message, autoclose=60000) != 0
+
+    def autorun(self, _profile, sources=None):
+        """
+        Runs profile [_profile] without user interaction (autorun service)
+        :param sources: files of the watch folder which are encoded by an encode only profile, these files are
+                        never deleted
+        """
+        self.unattended = True
+        self.getProfile(_profile)
+        if sources is not None:
+            self.sources = sources
+            self.process_all = True
+        self.checkSystemSettings(self.profile['mode'])
+        self.notifyLog('Autorun of profile \'%s\'' % self.task)
+        try:
+            listed = self.multidrive and self.profile['mode'] in [0, 1, 3]
+            if not (listed and self.processDrives()): self.process(listed=listed)
+            self.journal.purge()
+        finally:
+            self.logMetrics()
+
     def notifyLog(self, message, level=xbmc.LOGDEBUG):
         xbmc.log('[%s] %s' % (__addonID__, message), level)
 
+    def showStatistics(self):
+        #
+        # measured throughput of all stages, encoder settings ordered by cost (slowest first)
+        #
+        _stats = self.stats.read()
+        lines = list()
+        for stage, label in [('encode', 30216), ('rip', 30217), ('iso', 30218), ('copy', 30219)]:
+            if stage not in _stats: continue
+            lines.append('[B]%s[/B]' % __LS__(label))
+            for key, entry in sorted(_stats[stage].items(), key=lambda e: e[1]['bytes'] / e[1]['seconds']):
+                _line = '%s: %s/s (%s)' % (key, fmt_size(entry['bytes'] / entry['seconds']), entry['runs'])
+                if entry.get('fps'): _line += ', %s fps' % entry['fps']
+                lines.append(_line)
+            lines.append('')
+        self.Dialog.textviewer('%s - %s' % (__addonname__, __LS__(30215)), '\n'.join(lines))
+
+    def getEncoderKey(self, encoder=None):
+        if encoder is None: encoder = self.selectEncoder()
+        return '%s, %s, %s' % (encoder,
+                               re.sub(r'--maxWidth (\d+) --maxHeight (\d+)', r'\1x\2', self.profile['resolution']),
+                               self.profile['quality'])
+
+    def getDriveKey(self):
+        return self.drives.get(int(self.driveid), dict()).get('drive') or 'disc:%s' % self.driveid
+
+    def newJob(self, stage, **kwargs):
+        job = {'id': uuid.uuid4().hex, 'task': self.task, 'profile': self.profile, 'title': self.title}
+        return self.setStage(job, stage, **kwargs)
+
+    def getSource(self, job):
+        #
+        # absolute path of the source of an encode job, journals of older versions only have the file name in
+        # the temp folder
+        #
+        return job.get('source') or os.path.join(self.tempfolder, job['src'])
+
+    def setStage(self, job, stage, **kwargs):
+        job.update(kwargs)
+        job['stage'] = stage
+        self.journal.write(job)
+        return job
+
     def checkSystemSettings(self, mode):
 
         if mode in [0, 1, 3] and not self.ripper_executable:
@@ -191,37 +914,91 @@ class LoungeRipper(object):
         if not self.tempfolder or not self.profile['basefolder']:
             raise self.SystemSettingUndefinedException()
 
-    def getProcessPID(self, process):
-        if not process: return False
+    def getProcessPIDs(self):
+        """
+        Searches running processes of ripper, encoder, mkisofs and mkvmerge with a single scan of the process table
+        :return: dict of PID: executable
+        """
+        _executables = [_exec for _exec in [self.ripper_executable, self.encoder_executable,
+                                            self.mkisofs_executable, self.mkvmerge_executable] if _exec]
+        _running = dict()
         if OS == 'Linux':
-            _syscmd = subprocess.Popen(['pidof', process], stdout=subprocess.PIPE)
-            PID = _syscmd.stdout.read().strip().decode()
-            return False if not PID else PID
+            # /proc/<pid>/comm contains the first 15 chars of the executable name
+            _names = dict((_exec[:15], _exec) for _exec in _executables)
+            for _pid in os.listdir('/proc'):
+                if not _pid.isdigit(): continue
+                try:
+                    with open('/proc/%s/comm' % _pid, 'r') as comm: _name = comm.read().strip()
+                except OSError:
+                    continue
+                if _name in _names: _running[int(_pid)] = _names[_name]
         elif OS == 'Windows':
-            _tlcall = 'TASKLIST', '/FI', 'imagename eq %s' % os.path.basename(process)
-            _syscmd = subprocess.Popen(_tlcall, shell=True, stdout=subprocess.PIPE)
-            PID = _syscmd.communicate()[0].strip().splitlines()
-            if len(PID) > 1 and os.path.basename(process) in PID[-1].decode():
-                return PID[-1].split()[1].decode()
-            else: return False
+            _syscmd = subprocess.Popen(['TASKLIST', '/FO', 'CSV', '/NH'], shell=True, stdout=subprocess.PIPE)
+            for _task in csv.reader(_syscmd.communicate()[0].decode(errors='replace').splitlines()):
+                if len(_task) > 1 and _task[0] in _executables: _running[int(_task[1])] = _task[0]
         else:
-            self.notifyLog('Running on %s, could not determine PID of %s' % (OS, process))
-            return False
+            # no process table available, check the processes started by the addon
+            for _pid, _process in self.registry.read().items():
+                try:
+                    os.kill(int(_pid), 0)
+                    _running[int(_pid)] = _process
+                except OSError:
+                    self.registry.remove(_pid)
+        return _running
 
     def killProcessPID(self, pid, process=None):
-        if OS == 'Linux':
-            _syscmd = subprocess.call('kill -9 %s' % pid, shell=True)
-        elif OS == 'Windows':
-            _syscmd = subprocess.call('TASKKILL /F /IM %s' % os.path.basename(process), shell=True)
-        else: pass
+        if OS == 'Windows':
+            subprocess.call(['TASKKILL', '/F', '/PID', str(pid)], shell=True)
+        else:
+            try:
+                os.kill(int(pid), signal.SIGKILL)
+            except OSError as e:
+                self.notifyLog('Could not kill %s (PID %s): %s' % (process, pid, str(e)), xbmc.LOGERROR)
 
     def rmdirs(self, folder, force=True):
-        dirs, files = xbmcvfs.listdir(folder)
-        for file in files: xbmcvfs.delete(os.path.join(folder, file))
-        for dir in dirs:
-            self.rmdirs(os.path.join(folder, dir), force=force)
-            os.rmdir(os.path.join(folder, dir))
-        return
+        #
+        # delete the content of folder, local folders natively, VFS folders with concurrent delete operations
+        #
+        if isLocal(folder):
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False): shutil.rmtree(entry.path)
+                    else: os.remove(entry.path)
+            return
+
+        files = list()
+        folders = list()
+        _tree = [folder]
+        while _tree:
+            _folder = _tree.pop()
+            dirs, _files = xbmcvfs.listdir(_folder)
+            files.extend(os.path.join(_folder, file) for file in _files)
+            for dir in dirs:
+                folders.append(os.path.join(_folder, dir))
+                _tree.append(os.path.join(_folder, dir))
+        with ThreadPoolExecutor(CLEANUPWORKERS) as pool: list(pool.map(xbmcvfs.delete, files))
+        for dir in reversed(folders): xbmcvfs.rmdir(dir)
+
+    def rmdirsBackground(self, folder):
+        #
+        # move folder out of the way and delete it in a background thread, the next job could start immediately
+        #
+        trash = '%s.%s.deleted' % (folder, int(time.time()))
+        if not xbmcvfs.rename(folder, trash):
+            self.notifyLog('Could not move \'%s\' for background cleanup, delete it now' % folder)
+            self.rmdirs(folder, force=True)
+            return
+
+        def cleanup():
+            try:
+                with self.metrics.span('cleanup', folder=folder, background=True):
+                    self.rmdirs(trash, force=True)
+                    xbmcvfs.rmdir(trash)
+                self.notifyLog('\'%s\' removed in background' % folder)
+            except Exception:
+                self.notifyLog('Background cleanup failed: %s' % traceback.format_exc(), xbmc.LOGERROR)
+
+        threading.Thread(target=cleanup).start()
 
     def checkTempFolder(self):
         dirs, files = xbmcvfs.listdir(self.tempfolder)
@@ -230,53 +1007,92 @@ class LoungeRipper(object):
     def delTempFolder(self, force=False, file=None):
         #
         # delete old temp files recursive if there any, but only if there's no previous rip/encode running
+        # a single file which is already processed may deleted anytime (e.g. while ripping the next title)
         #
-        if self.getProcessPID(self.ripper_executable) or self.getProcessPID(self.encoder_executable) or \
-                self.getProcessPID(self.mkisofs_executable):
+        if file is not None and self.del_tf:
+            xbmcvfs.delete(file)
+            return True
+        elif self.getProcessPIDs():
             self.notifyLog('Couldn\'t clearing up folder %s, ripper, encoder or mkisofs active' % self.tempfolder)
             return False
         elif not (self.del_tf or force):
             self.notifyLog('Not allowed clearing up folder %s due settings' % self.tempfolder)
             return False
-        elif file is not None and self.del_tf:
-            xbmcvfs.delete(file)
-            return True
         elif force:
-            self.rmdirs(self.tempfolder, force=force)
+            with self.metrics.span('cleanup', folder=self.tempfolder):
+                self.rmdirs(self.tempfolder, force=force)
             return True
         else:
             return False
 
+    @staticmethod
+    def cleanTitle(title):
+        # remove '-[SEG|FPL]_MainFeature' from title and use only first part of title before underscore
+
+        title = re.sub('-[a-zA-Z]{3}_mainfeature', '', title, flags=re.IGNORECASE).split('_')[0]
+        return " ".join(word.capitalize() for word in title.split())
+
+    def scanCandidates(self):
+        #
+        # index of all valid files in the temp folder (or the files of the watch folder), main feature first
+        # (longest title of the disc model, otherwise the largest file). The index is scanned once and consumed by
+        # buildDestFileAndFolder
+        #
+        self.candidates = list()
+        if self.sources is not None:
+            for source in self.sources:
+                self.candidates.append({'name': os.path.basename(source), 'path': source,
+                                        'size': os.path.getsize(source)})
+        elif isLocal(self.tempfolder):
+            self.notifyLog('Search for the largest file in %s' % self.tempfolder)
+            with os.scandir(self.tempfolder) as entries:
+                for entry in entries:
+                    if entry.is_file() and os.path.splitext(entry.name)[1] in self.extensions:
+                        self.candidates.append({'name': entry.name, 'size': entry.stat().st_size})
+        else:
+            self.notifyLog('Search for the largest file in %s' % self.tempfolder)
+            for file in xbmcvfs.listdir(self.tempfolder)[1]:
+                if os.path.splitext(file)[1] in self.extensions:
+                    self.candidates.append({'name': file,
+                                            'size': xbmcvfs.Stat(os.path.join(self.tempfolder, file)).st_size()})
+
+        durations = dict()
+        if self.disc is not None:
+            for _title in self.disc['titles']:
+                if 'file' in _title: durations[_title['file']] = _title['duration']
+
+        for candidate in self.candidates:
+            candidate['duration'] = durations.get(candidate['name'], 0)
+            self.notifyLog('File: %s - %s' % (candidate['name'], fmt_size(candidate['size'])))
+        self.candidates = sorted([candidate for candidate in self.candidates if candidate['size'] > 0],
+                                 key=lambda c: (c['duration'], c['size']), reverse=True)
+
     def buildDestFileAndFolder(self, title=''):
-        rips = list()
-        content = xbmcvfs.listdir(self.tempfolder)
-        for files in content[1]:
-            if os.path.splitext(files)[1] in self.extensions: rips.append(files)
+        if self.candidates is None: self.scanCandidates()
+        rips = len(self.candidates)
 
         _fsize = 0
-        self.notifyLog('Search for the largest file in %s' % self.tempfolder)
-        for rip in rips:
-            file = xbmcvfs.File(os.path.join(self.tempfolder, rip))
-            self.notifyLog('File: %s - %s' % (rip, fmt_size(file.size())))
-            if file.size() > _fsize:
-                _fsize = file.size()
-                self.src = rip
-            file.close()
-
-        if len(rips) > 1:
+        self.src = None
+        if self.candidates:
+            candidate = self.candidates.pop(0)
+            self.src = candidate['name']
+            self.srcpath = candidate.get('path') or os.path.join(self.tempfolder, self.src)
+            self.srcsize = _fsize = candidate['size']
+
+        if rips > 1:
             if self.profile['mode'] == 0 or self.profile['mode'] == 1:
                 self.notifyLog('Suggest that %s with a size of %s is main movie' % (self.src, fmt_size(_fsize)))
 
             # Ask for multiple processing if it's not done before
 
             if self.profile['mode'] > 0 and self.del_tf and self.process_all is None:
-                self.process_all = False if self.Dialog.yesno(__addonname__, __LS__(30059), autoclose=60000) == 0 else True
+                self.process_all = self.confirm(__LS__(30059), not self.selectedtitles)
                 self.notifyLog('Process multiple files: %s' % self.process_all)
 
         if _fsize > 0:
             self.title = datetime.datetime.now().strftime('%Y-%m-%d.%H-%M-%S')
             _basename = '.'.join(self.src.split('.')[0:-1])
-            if 'title' in _basename and title == '':
+            if 'title' in _basename and title == '' and not self.unattended:
                 kb = xbmc.Keyboard('', __LS__(30030))
                 kb.doModal()
                 if kb.isConfirmed() and kb.getText() != '': self.title = kb.getText()
@@ -285,10 +1101,7 @@ class LoungeRipper(object):
             elif title:
                 self.title = title
 
-            # remove '-[SEG|FPL]_MainFeature' from title and use only first part of title before underscore
-
-            self.title = re.sub('-[a-zA-Z]{3}_mainfeature', '', self.title, flags=re.IGNORECASE).split('_')[0]
-            self.title = " ".join(word.capitalize() for word in self.title.split())
+            self.title = self.cleanTitle(self.title)
 
             if self.profile['mode'] == 2:
                 self.destfile = self.title + '.mkv'
@@ -302,124 +1115,1412 @@ class LoungeRipper(object):
             if self.profile['basefolder'] != self.tempfolder and not xbmcvfs.exists(self.destfolder): xbmcvfs.mkdirs(self.destfolder)
 
         else:
-            if self.process_all is False: raise self.CouldNotFindValidFilesException()
-
-    def pollSubprocess(self, process_exec, process_path, process, header=__LS__(30010)):
-        _val = ''
-        message = __LS__(30063)
-        _m = __LS__(30063)
-        percent = 0
-        _p = 0
-        _startsb = time.mktime(time.localtime())
-        self.ProgressBG.create('%s - %s' % (__addonname__, header), message)
+            if not self.process_all: raise self.CouldNotFindValidFilesException()
+
+    def onProgressTitle(self, values, state):
+        state['message'] = values[2]
+
+    def onProgressValue(self, values, state):
+        state['percent'] = int(values[0]) * 100 // int(values[2])
+
+    def onDrive(self, values, state):
+        self.drives[int(values[0])] = {'drive': values[4], 'name': values[5], 'device': values[6]}
+        if values[5] != '' and values[0] == str(self.driveid):
+            self.notifyLog('Reported media on \'%s\': %s' % (values[6], values[5]))
+            self.title = values[5]
+
+    def discTitle(self, index):
+        while len(self.disc['titles']) <= index:
+            self.disc['titles'].append({'index': len(self.disc['titles']), 'duration': 0, 'size': 0, 'streams': []})
+        return self.disc['titles'][index]
+
+    def onDiscInfo(self, values, state):
+        if self.disc is not None and int(values[0]) in DISCATTRIBUTES:
+            self.disc[DISCATTRIBUTES[int(values[0])]] = values[2]
+
+    def onTitleInfo(self, values, state):
+        if self.disc is None or int(values[1]) not in TITLEATTRIBUTES: return
+        attribute = TITLEATTRIBUTES[int(values[1])]
+        if attribute == 'duration':
+            self.discTitle(int(values[0]))[attribute] = toSeconds(values[3])
+        elif attribute in ['chapters', 'size']:
+            self.discTitle(int(values[0]))[attribute] = int(values[3])
+        else:
+            self.discTitle(int(values[0]))[attribute] = values[3]
+
+    def onStreamInfo(self, values, state):
+        if self.disc is None or int(values[2]) not in STREAMATTRIBUTES: return
+        streams = self.discTitle(int(values[0]))['streams']
+        while len(streams) <= int(values[1]): streams.append(dict())
+        streams[int(values[1])][STREAMATTRIBUTES[int(values[2])]] = values[4]
+
+    def onMessage(self, values, state):
+        self.notifyLog(values[3])
+        self.lastmessage = values[3]
+        if 'MEDIUM ERROR' in values[3] or 'HARDWARE ERROR' in values[3]:
+            raise self.MakemkvReportsMediumErrorException
+
+    def onEncoding(self, values, state):
+        state['message'] = 'Encoding'
+        state['percent'] = float(values[0])
+        if values[2]: state['fps'] = float(values[2])
+
+    def onIsoProgress(self, values, state):
+        state['message'] = 'create ISO'
+        state['percent'] = float(values[0])
+
+    def onMergeProgress(self, values, state):
+        state['message'] = 'join chunks'
+        state['percent'] = float(values[0])
+
+    def pollSubprocess(self, process_exec, process_path, process, header=__LS__(30010), progress=None, output=None,
+                       estimate=None, state=None, log=None):
+        """
+        Runs a subprocess and shows its progress
+        :param output: optional writable file (e.g. xbmcvfs.File), binary stdout of the process is streamed into it
+                       and only stderr is parsed for progress
+        :param estimate: expected duration in seconds (from statistics), used for the remaining time
+        :param state: optional dict, receives the final progress state (e.g. 'fps' of the encoder)
+        :param log: optional list, receives all output lines (without line ends)
+        :return: exit code of the process
+        """
+        if progress is None: progress = self.ProgressBG
+        if state is None: state = dict()
+        state.update({'message': __LS__(30063), 'percent': 0})
+        _shown = (0, __LS__(30063))
+        _next = 0
+        _startsb = time.time()
+        progress.create('%s - %s' % (__addonname__, header), state['message'])
         self.notifyLog(' %s command line: %s' % (process_exec, process))
 
+        _popen = {'stdout': subprocess.PIPE, 'stderr': subprocess.STDOUT, 'executable': process_path}
+        if output is None:
+            _popen.update({'encoding': 'utf-8', 'errors': 'replace', 'text': True})
+        else:
+            _popen['stderr'] = subprocess.PIPE
+
         if OS == 'Windows':
             startupinfo = subprocess.STARTUPINFO()
             startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
             startupinfo.wShowWindow = subprocess.SW_HIDE
+            _popen['startupinfo'] = startupinfo
+            _popen['creationflags'] = self.policy.creationflags()
 
-            proc = subprocess.Popen(shlex.split(process), stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                    executable=process_path, encoding='utf-8', text=True, startupinfo=startupinfo)
-        else:
-            proc = subprocess.Popen(shlex.split(process), stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                    executable=process_path, encoding='utf-8', text=True)
+        proc = subprocess.Popen(shlex.split(process), **_popen)
+        self.policy.apply(proc.pid)
+
+        #
+        # a reader thread passes the output lines, so aborts are recognized even if the process is quiet
+        #
+        lines = queue.Queue()
+        errors = list()
 
-        while proc.poll() is None:
-            if self.Monitor.abortRequested(): break
+        def reader():
+            _stream = proc.stdout if output is None else io.TextIOWrapper(proc.stderr, encoding='utf-8',
+                                                                          errors='replace')
+            for line in _stream: lines.put(line)
+            lines.put(None)
+
+        def writer():
+            buffer = bytearray(VFSCHUNK)
             try:
-                if percent != _p or message != _m:
+                while True:
+                    count = proc.stdout.readinto(buffer)
+                    if not count: break
+                    if not output.write(buffer if count == len(buffer) else buffer[:count]):
+                        raise IOError('could not write output of %s' % process_exec)
+            except Exception as e:
+                errors.append(e)
+                proc.kill()
+
+        threading.Thread(target=reader, daemon=True).start()
+        if output is not None:
+            _writer = threading.Thread(target=writer, daemon=True)
+            _writer.start()
+        self.registry.add(proc.pid, process_exec)
+        aborted = False
+        finished = False
+        state['paused'] = 0
+        _playing = False
+        _checked = 0
+        _applied = time.time()
+
+        try:
+            while True:
+                if self.Monitor.abortRequested():
+                    aborted = True
+                    break
+                #
+                # throttle or pause the process while Kodi plays, new threads get the policy of the profile
+                #
+                if self.policy.playback and time.time() >= _checked + UIINTERVAL:
+                    _checked = time.time()
+                    if self.Player.isPlaying() != _playing:
+                        _playing = not _playing
+                        if self.policy.playback == 2:
+                            self.policy.pause(proc.pid, _playing)
+                        else:
+                            self.policy.apply(proc.pid, throttled=_playing)
+                        if _playing:
+                            _pausedsince = time.time()
+                            progress.update(int(state['percent']), '%s - %s' % (__addonname__, header),
+                                            __LS__(30252 if self.policy.playback == 2 else 30253))
+                        else:
+                            if self.policy.playback == 2: state['paused'] += time.time() - _pausedsince
+                            _shown = None
+                        self.notifyLog('%s %s (PID %s) during playback' %
+                                       ('Pause' if self.policy.playback == 2 else 'Throttle', process_exec, proc.pid)
+                                       if _playing else 'Resume %s (PID %s)' % (process_exec, proc.pid))
+                if time.time() >= _applied + POLICYINTERVAL and not (_playing and self.policy.playback == 2):
+                    self.policy.apply(proc.pid, throttled=_playing, io=False)
+                    _applied = time.time()
+                try:
+                    line = lines.get(timeout=POLLINTERVAL)
+                    if line is None:
+                        finished = True
+                        break
+                    if log is not None: log.append(line.rstrip('\r\n'))
+                    event, values = parseEvent(line.rstrip())
+                    if event in self.outputhandlers: self.outputhandlers[event](values, state)
+                except queue.Empty:
+                    pass
+                except (ValueError, IndexError) as e:
+                    self.notifyLog('Ignore process error: %s' % str(e))
+
+                if (state['percent'], state['message']) != _shown and time.time() >= _next and not \
+                        (_playing and self.policy.playback == 2):
+                    percent, message = state['percent'], state['message']
+                    _elapsed = time.time() - _startsb - state['paused']
+                    _remaining = None
                     if percent > 0.4 and message == 'Encoding':
-                        _elapsed = time.mktime(time.localtime()) - _startsb
                         _remaining = datetime.timedelta(seconds=int(100 * _elapsed/percent - _elapsed))
-                        self.ProgressBG.update(int(percent), '%s - %s' % (__addonname__, header),
-                                               __LS__(30029) % (message, _remaining))
+                    elif estimate:
+                        _remaining = datetime.timedelta(seconds=int(max(estimate - _elapsed, 0)))
+                    if _remaining is not None:
+                        progress.update(int(percent), '%s - %s' % (__addonname__, header),
+                                        __LS__(30029) % (message, _remaining))
                         self.notifyLog('%s: %s%% done (%s remaining)' % (message, percent, _remaining))
                     else:
-                        self.ProgressBG.update(int(percent), '%s - %s' % (__addonname__, header),
-                                               __LS__(30066) % message)
+                        progress.update(int(percent), '%s - %s' % (__addonname__, header),
+                                        __LS__(30066) % message)
                         self.notifyLog('%s: %s%% done' % (message, percent))
 
-                    _p = percent
-                    _m = message
-
-                msg = proc.stdout.readline().rstrip()
-                data = msg.split(':')
-                if 'PRGC' in data[0]:
-                    _val = data[1].split(',')
-                    message = _val[2].replace('"', '')
-                elif 'PRGT' in data[0]:
-                    _val = data[1].split(',')
-                    message = _val[2].replace('"', '')
-                elif 'PRGV' in data[0]:
-                    _val = data[1].split(',')
-                    percent = int(_val[0]) * 100 // int(_val[2])
-                elif 'DRV' in data[0]:
-                    _val = data[1].replace('"', '').split(',')
-                    if _val[5] != '':
-                        self.notifyLog('Reported media on \'%s\': %s' % (_val[6], _val[5]))
-                        self.title = _val[5]
-                        continue
-                elif 'Encoding' in data[0]:
-                    message = data[0]
-                    _val = data[1].split(',')
-                    percent = float(re.match('^ [0-9]+(.[0-9])', _val[1]).group())
-                elif 'done, ' in data[0]:
-                    message = 'create ISO'
-                    percent = float(re.match('^[0-9]+(.[0-9])', data[0].lstrip()).group())
-                elif 'MSG' in data[0]:
-                    _val = data[1].split(',')
-                    self.notifyLog(_val[3].replace('"', ''))
-                    self.lastmessage = _val[3].replace('"', '')
-                    if 'MEDIUM ERROR' in _val[3] or 'HARDWARE ERROR' in _val[3]:
-                        self.ProgressBG.close()
-                        raise self.MakemkvReportsMediumErrorException
+                    _shown = (percent, message)
+                    _next = time.time() + UIINTERVAL
+        finally:
+            progress.close()
+            if finished:
+                #
+                # the output is closed, but the process could still exit. It's killed on abort only
+                #
+                if _playing and self.policy.playback == 2: self.policy.pause(proc.pid, False)
+                while not self.Monitor.abortRequested():
+                    try:
+                        proc.wait(timeout=POLLINTERVAL)
+                        break
+                    except subprocess.TimeoutExpired:
+                        pass
                 else:
-                    pass
-
-            except (UnicodeDecodeError, ValueError) as e:
-                self.notifyLog('Ignore process error: %s' % str(e))
-                continue
+                    aborted = True
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            self.registry.remove(proc.pid)
+            if output is not None: _writer.join()
 
-        self.ProgressBG.close()
         self.notifyLog('%s finished with status %s' % (process_exec, proc.poll()))
-        if proc.poll() is None: raise self.SubProcessAbortException()
-        return proc.poll()
+        if aborted: raise self.SubProcessAbortException()
+        if errors:
+            self.notifyLog('Output of %s could not written: %s' % (process_exec, str(errors[0])), xbmc.LOGERROR)
+            return -1
+        return proc.wait()
 
-    def copyfile(self, source, dest):
-        chunks = 0
+    def copyfile(self, source, dest, progress=None, title=None):
+        if progress is None: progress = self.ProgressBG
+        if title is None: title = self.title
 
         self.notifyLog('Copy file from \'%s\' to \'%s\'' % (source, dest))
+        span = self.metrics.span('copy', dest=dest).__enter__()
         try:
             if os.path.exists(source):
-                chunksize = os.path.getsize(source) // 100
-                self.ProgressBG.create('%s - %s' % (__addonname__, __LS__(30066) % self.title), __LS__(30067))
+                span.set(bytes=os.path.getsize(source))
+                progress.create('%s - %s' % (__addonname__, __LS__(30066) % title), __LS__(30067))
 
-                with open(source, 'rb') as src, xbmcvfs.File(dest, 'w') as dst:
-                    while True:
-                        self.ProgressBG.update(chunks, '%s - %s' % (__addonname__, __LS__(30066) % self.title), __LS__(30067))
-                        chunk = bytearray(src.read(chunksize))
-                        if not chunk:
-                            self.notifyLog('%s chunks transmitted' % chunks)
-                            break
-                        dst.write(chunk)
-                        chunks += 1
+                if isLocal(dest) and sameDevice(source, dest):
+                    #
+                    # same filesystem: move (or link if the source should kept), no data has to be copied
+                    #
+                    if os.path.exists(dest): os.remove(dest)
+                    if self.del_tf:
+                        os.replace(source, dest)
+                        self.notifyLog('Source moved to destination')
+                        span.set(method='move')
+                    else:
+                        try:
+                            os.link(source, dest)
+                            self.notifyLog('Destination linked to source')
+                            span.set(method='link')
+                        except OSError:
+                            self.localcopy(source, dest, progress, title)
+                            span.set(method='local')
+                elif self.verifycopy:
+                    #
+                    # copy into a partial file (local partial files are continued by the next attempt), the
+                    # destination is read back and must match the checksum of the source before it is renamed
+                    #
+                    if isLocal(dest):
+                        checksum = self.localcopy(source, dest + '.part', progress, title, verify=True)
+                    else:
+                        checksum = self.streamcopy(source, dest + '.part', progress, title, verify=True)
+                    self.finishPart(dest + '.part')
+                    span.set(method='verified', checksum=checksum)
+                elif isLocal(dest):
+                    self.localcopy(source, dest, progress, title)
+                    span.set(method='local')
+                else:
+                    self.streamcopy(source, dest, progress, title)
+                    span.set(method='stream')
             else:
                 raise self.CouldNotFindValidFilesException
-        except Exception:
+        except Exception as e:
             self.notifyLog('An error has occurred: %s' % traceback.format_exc(), xbmc.LOGERROR)
-            self.ProgressBG.close()
+            progress.close()
+            span.__exit__(type(e), e, None)
             raise self.CurrentProcessAbortedException()
 
-        self.ProgressBG.close()
-        if self.del_tf: self.delTempFolder(file=source)
+        progress.close()
+        span.__exit__(None, None, None)
+        if self.del_tf and os.path.exists(source): self.delTempFolder(file=source)
+
+    def resumeOffset(self, source, part):
+        """
+        Compares the partial destination of a previous attempt with the source in segments of RESUMESEGMENT bytes
+        :return: length of the part which could be continued and checksum (hash object) of this part
+        """
+        checksum = hashlib.sha1()
+        if not os.path.exists(part): return 0, checksum
+        segments = min(os.path.getsize(part), os.path.getsize(source)) // RESUMESEGMENT
+        offset = 0
+        with open(source, 'rb') as src, open(part, 'rb') as dst:
+            for _ in range(segments):
+                segment = checksum.copy()
+                for _ in range(RESUMESEGMENT // VFSCHUNK):
+                    buffer = src.read(VFSCHUNK)
+                    if buffer != dst.read(VFSCHUNK): break
+                    segment.update(buffer)
+                else:
+                    checksum = segment
+                    offset += RESUMESEGMENT
+                    continue
+                break
+        if offset: self.notifyLog('Continue copy of \'%s\' at %s' % (part, fmt_size(offset)))
+        return offset, checksum
+
+    def localcopy(self, source, dest, progress, title, verify=False):
+        """
+        Copies between local volumes, let the kernel copy the data (copy_file_range, sendfile) if possible,
+        otherwise use a single buffer of COPYCHUNK bytes
+        :param verify: continue an existing partial dest and calculate a checksum, the data has to pass the buffer
+        :return: checksum (verify only)
+        """
+        size = os.path.getsize(source)
+        methods = ['readinto'] if verify else ['copy_file_range', 'sendfile', 'readinto']
+        buffer = None
+        offset, checksum = self.resumeOffset(source, dest) if verify else (0, None)
+        started = time.time()
+        _next = 0
+        with open(source, 'rb', buffering=0) as src, open(dest, 'r+b' if offset else 'wb', buffering=0) as dst:
+            src.seek(offset)
+            dst.seek(offset)
+            dst.truncate()
+            done = offset
+            while done < size:
+                if self.Monitor.abortRequested(): raise self.SubProcessAbortException()
+                try:
+                    if methods[0] == 'copy_file_range':
+                        count = os.copy_file_range(src.fileno(), dst.fileno(), COPYCHUNK)
+                    elif methods[0] == 'sendfile':
+                        count = os.sendfile(dst.fileno(), src.fileno(), None, COPYCHUNK)
+                    else:
+                        if buffer is None: buffer = memoryview(bytearray(COPYCHUNK))
+                        count = src.readinto(buffer)
+                        written = 0
+                        while written < count: written += dst.write(buffer[written:count])
+                        if checksum is not None: checksum.update(buffer[:count])
+                except (AttributeError, OSError):
+                    # not supported by os/filesystem, switch to the next method as long as nothing is copied
+                    if done > 0 or len(methods) == 1: raise
+                    self.notifyLog('%s not available, fall back to %s' % (methods[0], methods[1]))
+                    methods.pop(0)
+                    continue
+                if count == 0: break
+                done += count
+                if time.time() >= _next:
+                    self.transferProgress(progress, title, done, size, started, offset)
+                    _next = time.time() + 1
+            # a short copy (e.g. copy_file_range returns 0 early) must not pass, the source is deleted afterwards
+            if done != size or os.fstat(dst.fileno()).st_size != size:
+                raise IOError('size of %s differs from source (%s of %s bytes)' % (dest, done, size))
+            if verify: os.fsync(dst.fileno())
+        self.notifyLog('%s transmitted using %s (%s/s)' %
+                       (fmt_size(done - offset), methods[0],
+                        fmt_size((done - offset) / max(time.time() - started, 0.001))))
+        self.stats.record('copy', self.profile['basefolder'], done - offset, time.time() - started)
+        if verify:
+            if self.readChecksum(dest).digest() != checksum.digest():
+                raise IOError('checksum of %s differs from source' % dest)
+            self.notifyLog('Checksum (SHA1) of \'%s\': %s' % (dest, checksum.hexdigest()))
+            return checksum.hexdigest()
+
+    def streamcopy(self, source, dest, progress, title, verify=False):
+        """
+        Copies to VFS destinations: a reader thread fills VFSBUFFERS preallocated buffers from the local source
+        while the previous buffer is written to the destination
+        :param verify: calculate the checksum of the source and compare it with the destination read back. VFS
+                       files couldn't opened for append, so partial destinations can't continued and are
+                       written again
+        :return: checksum (verify only)
+        """
+        size = os.path.getsize(source)
+        free = queue.Queue()
+        filled = queue.Queue()
+        errors = list()
+        readsum = hashlib.sha1()
+        for _ in range(VFSBUFFERS): free.put(bytearray(VFSCHUNK))
+
+        def reader():
+            try:
+                with open(source, 'rb', buffering=0) as src:
+                    while True:
+                        buffer = free.get()
+                        if buffer is None: break
+                        count = src.readinto(buffer)
+                        if verify: readsum.update(memoryview(buffer)[:count])
+                        filled.put((buffer, count))
+                        if count == 0: break
+            except Exception as e:
+                errors.append(e)
+                filled.put((None, 0))
+
+        thread = threading.Thread(target=reader, daemon=True)
+        thread.start()
+        started = time.time()
+        _next = 0
+        done = 0
+        try:
+            with xbmcvfs.File(dest, 'w') as dst:
+                while True:
+                    if self.Monitor.abortRequested(): raise self.SubProcessAbortException()
+                    buffer, count = filled.get()
+                    if not count: break
+                    if not dst.write(buffer if count == len(buffer) else buffer[:count]):
+                        raise IOError('could not write to %s' % dest)
+                    done += count
+                    free.put(buffer)
+                    if time.time() >= _next:
+                        self.transferProgress(progress, title, done, size, started)
+                        _next = time.time() + 1
+        finally:
+            # wake up the reader if it waits for a free buffer
+            free.put(None)
+            thread.join()
+        if errors: raise errors[0]
+        if done != size: raise IOError('size of %s differs from source (%s of %s bytes)' % (dest, done, size))
+        self.notifyLog('%s transmitted (%s/s)' % (fmt_size(done), fmt_size(done / max(time.time() - started, 0.001))))
+        self.stats.record('copy', self.profile['basefolder'], done, time.time() - started)
+        if verify:
+            if xbmcvfs.Stat(dest).st_size() != size:
+                raise IOError('size of %s differs from source (%s of %s bytes)' % (dest, done, size))
+            if self.readChecksum(dest).digest() != readsum.digest():
+                raise IOError('checksum of %s differs from source' % dest)
+            self.notifyLog('Checksum (SHA1) of \'%s\': %s' % (dest, readsum.hexdigest()))
+            return readsum.hexdigest()
+
+    def readChecksum(self, file):
+        """
+        Reads a copied file back from the destination (local files without the page cache if possible)
+        :param file: local file or VFS url
+        :return: checksum (hash object, SHA1) of file
+        """
+        checksum = hashlib.sha1()
+        if isLocal(file):
+            with open(file, 'rb', buffering=0) as f:
+                if hasattr(os, 'posix_fadvise'): os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+                buffer = memoryview(bytearray(VFSCHUNK))
+                while True:
+                    if self.Monitor.abortRequested(): raise self.SubProcessAbortException()
+                    count = f.readinto(buffer)
+                    if not count: break
+                    checksum.update(buffer[:count])
+        else:
+            with xbmcvfs.File(file) as f:
+                while True:
+                    if self.Monitor.abortRequested(): raise self.SubProcessAbortException()
+                    buffer = f.readBytes(VFSCHUNK)
+                    if not buffer: break
+                    checksum.update(buffer)
+        return checksum
+
+    def transferProgress(self, progress, title, done, size, started, offset=0):
+        _elapsed = time.time() - started
+        _rate = (done - offset) / _elapsed if _elapsed > 0 else 0
+        _remaining = datetime.timedelta(seconds=int((size - done) / _rate)) if _rate > 0 else '-'
+        progress.update(int(done * 100 // size) if size else 100,
+                        '%s - %s' % (__addonname__, __LS__(30066) % title),
+                        __LS__(30209) % (fmt_size(done), fmt_size(size), fmt_size(_rate), _remaining))
+
+    def encode(self, job, progress=None):
+        """
+        Encodes a single ripped file into the destination folder
+        :param job: dict with keys 'src' (name of the source), 'source' (path of the source), 'destfolder',
+                    'destfile' and 'keep' (source isn't deleted)
+        :param progress: progress dialog used for this job, defaults to self.ProgressBG
+        """
+        tmp = job.get('tmp', str(int(time.time())))
+        self.setStage(job, 'encode', tmp=tmp)
+        direct = self.isDirectOutput(job['destfolder'])
+        output = os.path.join(job['destfolder'], job['destfile'] + '.part') if direct \
+            else os.path.join(self.tempfolder, tmp)
+        encoder = self.selectEncoder()
+        source = self.getSource(job)
+        streamoptions = self.getStreamOptions(source, progress=progress)
+        chunks = self.getChunks(source, progress=progress)
+        _size = os.path.getsize(source)
+        while True:
+            _rate = self.stats.rate('encode', self.getEncoderKey(encoder))
+            _state = dict()
+            _started = time.time()
+            with self.metrics.span('encode', file=job['destfile'], bytes=_size, encoder=encoder,
+                                   chunks=len(chunks) if chunks else None) as span:
+                if chunks:
+                    _rv = self.encodeChunks(job, source, output, self.getHandBrakeOptions(encoder, streamoptions),
+                                            chunks, progress=progress)
+                else:
+                    # encode() runs concurrently (encoder pool, drives), the command line is kept local
+                    _encode = '"%s" -i "%s" -o "%s" %s 2>&1' % \
+                              (self.encoder_executable, source, output, self.getHandBrakeOptions(encoder, streamoptions))
+                    _rv = self.pollSubprocess(self.encoder_executable, self.encoder_path, _encode,
+                                              job['destfile'], progress=progress,
+                                              estimate=_size / _rate if _rate else None, state=_state)
+                span.set(exit=_rv, fps=_state.get('fps'))
+            if encoder != SWENCODER[self.profile['codec']] and _rv == 0:
+                self.encodercache.failed(self.encoder_path, encoder, success=True)
+            #
+            # a killed process (negative status) isn't a failure of the encoder
+            #
+            if _rv <= 0 or encoder == SWENCODER[self.profile['codec']]: break
+            #
+            # hardware encoder doesn't work (driver, device or format), encode in software. It is disabled after
+            # ENCODERFAILURES failures in a row
+            #
+            self.notifyLog('Encoder %s failed, fall back to %s' % (encoder, SWENCODER[self.profile['codec']]),
+                           xbmc.LOGERROR)
+            if self.encodercache.failed(self.encoder_path, encoder):
+                self.notifyLog('Encoder %s failed %s times, disabled' % (encoder, ENCODERFAILURES), xbmc.LOGWARNING)
+            encoder = SWENCODER[self.profile['codec']]
+        if _rv != 0:
+            raise self.HandBrakeCLIExitsNotProperlyException()
+        self.stats.record('encode', self.getEncoderKey(encoder), _size,
+                          time.time() - _started - _state.get('paused', 0), fps=_state.get('fps'))
+
+        if direct:
+            self.finishPart(output)
+        else:
+            self.setStage(job, 'copy', copysrc=os.path.join(self.tempfolder, tmp),
+                          copydest=os.path.join(job['destfolder'], job['destfile']))
+            self.copyfile(job['copysrc'], job['copydest'], progress=progress, title=job['destfile'])
+        # sources of the watch folder belong to the user
+        if self.del_tf and not job.get('keep'): self.delTempFolder(force=True, file=source)
+        self.setStage(job, 'done')
+
+    def getHandBrakeOptions(self, encoder, streamoptions):
+        #
+        # all options of HandBrakeCLI except input and output, the same for a whole title and its chunks
+        #
+        return '-f mkv --decomb fast -N %s -m -Z "%s MKV 2160p60" -e %s %s %s %s %s %s' % \
+               (self.lang3,
+                self.profile['codec'],
+                encoder,
+                streamoptions,
+                self.profile['quality'],
+                self.profile['resolution'],
+                self.getEncoderLimits(encoder),
+                self.profile['additionalhandbrakeargs'])
+
+    def getChunks(self, source, progress=None):
+        """
+        Splits long titles into ranges of chapters which are encoded concurrently (chunked encoding)
+        :param source: file in temp folder
+        :return: list of dicts with 'index', 'first' and 'last' chapter and 'duration' (seconds) of the chunks,
+                 None if the title is encoded as a whole
+        """
+        # without concurrent encoders chunks are encoded one after another, that's overhead only
+        if not self.chunkencode or self.chunkjobs + len(self.encodeworkers) < 2: return None
+        if not self.mkvmerge_executable:
+            self.notifyLog('Chunked encoding needs mkvmerge, encode as a whole', xbmc.LOGWARNING)
+            return None
+        try:
+            streams = self.getStreams(source, progress=progress)
+        except (OSError, subprocess.SubprocessError) as e:
+            self.notifyLog('Could not scan chapters of \'%s\': %s' % (source, str(e)), xbmc.LOGERROR)
+            return None
+        chapters = streams['chapters']
+        duration = streams['duration'] or sum(chapters)
+        if duration < self.chunkminlength or len(chapters) < 2: return None
+
+        count = min(len(chapters), (self.chunkjobs + len(self.encodeworkers)) * CHUNKSPERWORKER)
+        chunks = list()
+        first = 1
+        elapsed = 0
+        for chapter, length in enumerate(chapters, 1):
+            elapsed += length
+            #
+            # close the chunk at the chapter boundary next to its share of the duration, but leave at least
+            # one chapter for each of the remaining chunks
+            #
+            if chapter == len(chapters) or (elapsed >= duration * (len(chunks) + 1) / count and
+                                            len(chapters) - chapter >= count - len(chunks) - 1):
+                chunks.append({'index': len(chunks) + 1, 'first': first, 'last': chapter,
+                               'duration': sum(chapters[first - 1:chapter])})
+                first = chapter + 1
+        if len(chunks) < 2: return None
+        self.notifyLog('Encode \'%s\' (%s) in %s chunks: %s' %
+                       (source, datetime.timedelta(seconds=duration), len(chunks),
+                        ', '.join('%s-%s' % (chunk['first'], chunk['last']) for chunk in chunks)))
+        return chunks
+
+    def encodeChunks(self, job, source, output, options, chunks, progress=None):
+        """
+        Encodes the chunks of a title concurrently by [chunkjobs] local encoder processes and the encoder workers
+        of the network, then joins the encoded chunks losslessly into output
+        :param options: options of HandBrakeCLI (without input, output and chapters)
+        :param chunks: chapter ranges from getChunks
+        :return: exit code, 0 if all chunks are encoded and joined
+        """
+        tmp = job.get('tmp', str(int(time.time())))
+        for chunk in chunks: chunk['file'] = os.path.join(self.tempfolder, '%s.chunk%02d' % (tmp, chunk['index']))
+        pending = queue.Queue()
+        for chunk in sorted(chunks, key=lambda c: c['duration'], reverse=True): pending.put(chunk)
+        failed = list()
+        errors = list()
+
+        progress = MultiProgress(job['destfile'], dialog=self.ProgressBG if progress is None else progress,
+                                 total=len(chunks))
+        workers = list()
+        for slot in [None] * min(self.chunkjobs, len(chunks)) + self.encodeworkers:
+            name = __LS__(30201) % (len(workers) + 1) if slot is None else '%s:%s' % slot
+            workers.append(threading.Thread(target=self.chunkWorker, daemon=True,
+                                            args=(slot, source, options, pending, failed, errors,
+                                                  progress.job(name))))
+            workers[-1].start()
+        for worker in workers: worker.join()
+        if not (failed or errors) and not pending.empty():
+            # chunks of workers which got lost after the local encoders had finished
+            self.chunkWorker(None, source, options, pending, failed, errors, progress.job(__LS__(30201) % 1))
+        progress.close()
+
+        try:
+            if errors: raise errors[0]
+            if failed or not pending.empty(): return failed[0] if failed else -1
+            #
+            # lossless join of the encoded chunks (timestamps and chapters are continued)
+            #
+            _merge = '"%s" -o "%s" %s' % (self.mkvmerge_executable, output,
+                                          ' + '.join('"%s"' % chunk['file'] for chunk in chunks))
+            _rv = self.pollSubprocess(self.mkvmerge_executable, self.mkvmerge_path, _merge, job['destfile'],
+                                      progress=progress.dialog)
+            # mkvmerge: 1 means completed with warnings
+            return 0 if _rv in [0, 1] else _rv
+        finally:
+            for chunk in chunks:
+                if os.path.exists(chunk['file']): os.remove(chunk['file'])
+
+    def chunkWorker(self, worker, source, options, pending, failed, errors, progress):
+        #
+        # encodes chunks from queue 'pending' until it is empty or a chunk has failed, locally (worker is None)
+        # or by an encoder worker (host, port). Chunks of an unreachable worker are left to the others
+        #
+        while not (failed or errors or self.Monitor.abortRequested()):
+            try:
+                chunk = pending.get_nowait()
+            except queue.Empty:
+                break
+            _options = '-c %s-%s %s' % (chunk['first'], chunk['last'], options)
+            try:
+                if worker is None:
+                    _rv = self.pollSubprocess(self.encoder_executable, self.encoder_path,
+                                              '"%s" -i "%s" -o "%s" %s 2>&1' %
+                                              (self.encoder_executable, source, chunk['file'], _options),
+                                              chunk['index'], progress=progress)
+                else:
+                    _rv = self.remoteEncode(worker, source, chunk['file'], _options, progress=progress)
+                    if _rv is None:
+                        pending.put(chunk)
+                        break
+            except Exception as e:
+                errors.append(e)
+                break
+            if _rv != 0:
+                self.notifyLog('Chunk %s (chapters %s-%s) failed with status %s' %
+                               (chunk['index'], chunk['first'], chunk['last'], _rv), xbmc.LOGERROR)
+                failed.append(_rv)
+            else:
+                progress.finish()
+
+    def remoteEncode(self, worker, source, output, options, progress):
+        """
+        Encodes by an encoder worker of the network (encodeworker.py), source and output have to be accessible
+        by the worker (shared or mapped folders)
+        :param worker: tuple of host and port
+        :param options: options of HandBrakeCLI (without input and output)
+        :return: exit code of the remote HandBrakeCLI, None if the worker isn't reachable or got lost
+        """
+        try:
+            sock = socket.create_connection(worker, timeout=10)
+            sock.settimeout(None)
+        except OSError as e:
+            self.notifyLog('Encoder worker %s:%s not reachable: %s' % (worker[0], worker[1], str(e)),
+                           xbmc.LOGWARNING)
+            return None
+
+        lines = queue.Queue()
+
+        def reader():
+            try:
+                for line in sock.makefile('r', encoding='utf-8', errors='replace'): lines.put(line)
+            except OSError:
+                pass
+            lines.put(None)
+
+        state = {'message': __LS__(30063), 'percent': 0}
+        _rv = None
+        _next = 0
+        progress.create('%s - %s:%s' % (__addonname__, worker[0], worker[1]), state['message'])
+        self.notifyLog('Encode \'%s\' by worker %s:%s: %s' % (output, worker[0], worker[1], options))
+        try:
+            sock.sendall((json.dumps({'input': source, 'output': output,
+                                      'options': shlex.split(options)}) + '\n').encode('utf-8'))
+            threading.Thread(target=reader, daemon=True).start()
+            while True:
+                if self.Monitor.abortRequested(): raise self.SubProcessAbortException()
+                try:
+                    line = lines.get(timeout=POLLINTERVAL)
+                except queue.Empty:
+                    continue
+                if line is None: break
+                event, values = parseEvent(line.rstrip())
+                if event == 'EXIT':
+                    _rv = int(values[0])
+                elif event == 'Encoding':
+                    self.onEncoding(values, state)
+                if time.time() >= _next:
+                    progress.update(int(state['percent']), '%s - %s:%s' % (__addonname__, worker[0], worker[1]),
+                                    __LS__(30066) % state['message'])
+                    _next = time.time() + UIINTERVAL
+        except OSError as e:
+            self.notifyLog('Connection to encoder worker %s:%s lost: %s' % (worker[0], worker[1], str(e)),
+                           xbmc.LOGERROR)
+        finally:
+            progress.close()
+            sock.close()
+        self.notifyLog('Encoder worker %s:%s finished with status %s' % (worker[0], worker[1], _rv))
+        return _rv
+
+    def isDirectOutput(self, destfolder):
+        #
+        # HandBrakeCLI and mkisofs could write into local (or mounted) folders only
+        #
+        if not self.directoutput: return False
+        if not isLocal(destfolder):
+            self.notifyLog('Destination \'%s\' isn\'t local, use temporary folder' % destfolder)
+            return False
+        return True
+
+    def finishPart(self, part):
+        #
+        # rename the completed partial file to its final name
+        #
+        dest = part[:-len('.part')]
+        if isLocal(part):
+            os.replace(part, dest)
+        else:
+            if xbmcvfs.exists(dest): xbmcvfs.delete(dest)
+            xbmcvfs.rename(part, dest)
+        self.notifyLog('\'%s\' completed in destination' % dest)
+
+    def getDestFolder(self, title):
+        destfolder = os.path.join(self.profile['basefolder'], title) if self.profile['subfolder'] \
+            else self.profile['basefolder']
+        if not xbmcvfs.exists(destfolder): xbmcvfs.mkdirs(destfolder)
+        return destfolder
+
+    def getStreams(self, source, progress=None):
+        """
+        Audio and subtitle tracks, chapters and duration of source reported by 'HandBrakeCLI --scan', cached per
+        source file
+        :return: dict with lists 'audio' and 'subtitles' of tracks (dicts with 'index', 'lang', 'description'),
+                 'chapters' (list of durations in seconds) and 'duration' (seconds)
+        """
+        cachefile = os.path.join(__profile__, 'streams.json')
+        _stat = os.stat(source)
+        _id = '%s:%s:%s' % (source, _stat.st_size, int(_stat.st_mtime))
+        with self.streamlock:
+            cache = dict()
+            if os.path.exists(cachefile):
+                try:
+                    with open(cachefile, 'r', encoding='utf-8') as f: cache = json.load(f)
+                except ValueError:
+                    self.notifyLog('Stream cache is corrupted, rebuild it', xbmc.LOGWARNING)
+            if _id in cache and 'chapters' in cache[_id]: return cache[_id]
+
+        _scan = list()
+        _rv = self.pollSubprocess(self.encoder_executable, self.encoder_path,
+                                  '"%s" --scan -i "%s" -t 1' % (self.encoder_executable, source),
+                                  os.path.basename(source), progress=progress, log=_scan)
+        # a failed scan isn't cached
+        if _rv != 0: raise subprocess.SubprocessError('%s --scan exits with status %s' % (self.encoder_executable, _rv))
+        streams = {'audio': [], 'subtitles': [], 'chapters': [], 'duration': 0, 'time': time.time()}
+        section = None
+        for line in _scan:
+            if SCANDURATION.match(line) and not streams['duration']:
+                streams['duration'] = toSeconds(SCANDURATION.match(line).group(1))
+            elif re.match(r'^\s+\+ chapters:', line):
+                section = 'chapters'
+            elif section == 'chapters' and SCANCHAPTER.match(line):
+                streams['chapters'].append(toSeconds(SCANCHAPTER.match(line).group(2)))
+            elif re.match(r'^\s+\+ audio tracks:', line):
+                section = 'audio'
+            elif re.match(r'^\s+\+ subtitle tracks:', line):
+                section = 'subtitles'
+            elif section in ['audio', 'subtitles'] and SCANTRACK.match(line):
+                match = SCANTRACK.match(line)
+                streams[section].append({'index': int(match.group(1)), 'description': match.group(2),
+                                         'lang': match.group(3) or 'und'})
+            elif section and re.match(r'^\s*\+ ', line):
+                section = None
+        self.notifyLog('Streams of \'%s\': %s audio, %s subtitle tracks, %s chapters' %
+                       (source, len(streams['audio']), len(streams['subtitles']), len(streams['chapters'])))
+
+        with self.streamlock:
+            cache[_id] = streams
+            for _key in sorted(cache, key=lambda k: cache[k].get('time', 0))[:-STREAMCACHESIZE]: del cache[_key]
+            if not os.path.exists(__profile__): os.makedirs(__profile__)
+            with open(cachefile, 'w', encoding='utf-8') as f: json.dump(cache, f)
+        return streams
+
+    def getStreamOptions(self, source, progress=None):
+        #
+        # audio and subtitle options of HandBrakeCLI: without stream rules in the profile the native language
+        # (and all foreign tracks if wanted), otherwise the tracks of the wanted languages (in the order of the
+        # language list, commentaries dropped) up to the max. number of tracks
+        #
+        if not (self.profile['audiolangs'] or self.profile['sublangs'] or self.profile['audiopassthru']):
+            return '--native-dub -s 1 %s' % self.profile['foreignaudio']
+        try:
+            streams = self.getStreams(source, progress=progress)
+        except (OSError, subprocess.SubprocessError) as e:
+            self.notifyLog('Could not scan streams of \'%s\': %s' % (source, str(e)), xbmc.LOGERROR)
+            return '--native-dub -s 1 %s' % self.profile['foreignaudio']
+
+        audio = [track for track in streams['audio']
+                 if not (self.profile['nocommentary'] and 'comment' in track['description'].lower())]
+        langs = self.profile['audiolangs'] or [self.lang3]
+        tracks = [track['index'] for lang in langs for track in audio if track['lang'] == lang]
+        tracks = tracks[:self.profile['audiotracks']] or [streams['audio'][0]['index'] if streams['audio'] else 1]
+        _opts = ['-a %s' % ','.join(str(track) for track in tracks)]
+        if self.profile['audiopassthru']:
+            _opts.append('-E %s --audio-fallback av_aac' % ','.join(['copy'] * len(tracks)))
+
+        subtitles = [track['index'] for lang in self.profile['sublangs'] for track in streams['subtitles']
+                     if track['lang'] == lang]
+        _opts.append('-s %s' % ','.join(str(track) for track in subtitles) if subtitles else
+                     '-s 1' if not self.profile['sublangs'] else '-s none')
+        self.notifyLog('Audio tracks %s of %s, subtitles %s of %s' %
+                       (tracks, len(streams['audio']), subtitles, len(streams['subtitles'])))
+        return ' '.join(_opts)
+
+    def selectEncoder(self):
+        #
+        # first available hardware encoder of the codec if the profile wants one, otherwise the software encoder
+        #
+        if self.profile['hwencoder']:
+            try:
+                available = self.encodercache.encoders(self.encoder_path)
+                for encoder in HWENCODERS[self.profile['codec']]:
+                    if encoder in available: return encoder
+                self.notifyLog('No hardware encoder for %s available' % self.profile['codec'], xbmc.LOGWARNING)
+            except (OSError, subprocess.SubprocessError) as e:
+                self.notifyLog('Could not probe encoders of %s: %s' % (self.encoder_executable, str(e)),
+                               xbmc.LOGERROR)
+        return SWENCODER[self.profile['codec']]
+
+    def getEncoderLimits(self, encoder):
+        #
+        # speed preset and thread cap per encoder job, x264 knows 'threads', x265 uses thread 'pools'.
+        # Presets and threads of the hardware encoders are different, they are used with their defaults
+        #
+        _opts = list()
+        if encoder != SWENCODER[self.profile['codec']]: return ''
+        if self.profile['encoderpreset']: _opts.append('--encoder-preset %s' % self.profile['encoderpreset'])
+        if self.profile['encoderthreads'] > 0:
+            _opts.append('--encopts %s=%s' % ('pools' if self.profile['codec'] == 'H.265' else 'threads',
+                                               self.profile['encoderthreads']))
+        return ' '.join(_opts)
+
+    def encodeWorker(self, jobs, errors, progress=None):
+        #
+        # consumes ripped titles from queue 'jobs' until None is received, errors are passed to the caller
+        #
+        if progress is None: progress = xbmcgui.DialogProgressBG()
+        while True:
+            job = jobs.get()
+            try:
+                if job is None: break
+                if errors or self.Monitor.abortRequested(): continue
+                self.encode(job, progress=progress)
+                if isinstance(progress, MultiProgress.Job): progress.finish()
+            except Exception as e:
+                self.notifyLog('Encoding of \'%s\' failed: %s' % (job['src'], traceback.format_exc()), xbmc.LOGERROR)
+                errors.append(e)
+            finally:
+                jobs.task_done()
+
+    def encodePool(self):
+        #
+        # encode all files of the temp folder with [encoderjobs] concurrent encoder processes
+        #
+        jobs = queue.Queue()
+        errors = list()
+        queued = list()
+        while self.src is not None:
+            queued.append(self.src)
+            jobs.put(self.newJob('encode', src=self.src, source=self.srcpath, keep=self.sources is not None,
+                                 destfolder=self.destfolder, destfile=self.destfile,
+                                 tmp='%s.%s' % (int(time.time()), len(queued))))
+            self.notifyLog('Queue \'%s\' for encoding into \'%s\'' % (self.src, self.destfile))
+            self.buildDestFileAndFolder()
+
+        progress = MultiProgress(self.task, total=len(queued))
+        workers = list()
+        for worker in range(min(self.encoderjobs, len(queued))):
+            workers.append(threading.Thread(target=self.encodeWorker, daemon=True,
+                                            args=(jobs, errors, progress.job(__LS__(30201) % (worker + 1)))))
+            workers[-1].start()
+            jobs.put(None)
+        self.notifyLog('%s files are encoded by %s workers' % (len(queued), len(workers)))
+
+        for worker in workers: worker.join()
+        progress.close()
+        if errors: raise errors[0]
+
+    def getDiscID(self):
+        #
+        # fingerprint of the disc: label and the volume descriptors (sectors 16-271, includes UDF anchor)
+        #
+        device = self.drives.get(int(self.driveid), dict()).get('device')
+        try:
+            with open(device, 'rb') as dev:
+                dev.seek(16 * 2048)
+                return hashlib.sha1(self.title.encode('utf-8') + dev.read(256 * 2048)).hexdigest()
+        except (OSError, TypeError, ValueError) as e:
+            self.notifyLog('Could not read volume descriptors of \'%s\': %s' % (device, str(e)))
+            return None
+
+    def getDiscInfo(self):
+        """
+        Scans the titles of the disc in drive [driveid] or takes them from the cache of known discs
+        :return: disc model, dict with 'id', 'name', 'minlength' and 'titles' (list of dicts with the title
+                 attributes of TITLEATTRIBUTES and the 'streams' with attributes of STREAMATTRIBUTES)
+        """
+        discid = self.getDiscID()
+        cache = self.readDiscCache()
+        if discid in cache and cache[discid]['minlength'] == self.profile['mintitlelength']:
+            self.notifyLog('Disc \'%s\' is known, skip scan of titles' % self.title)
+            self.disc = cache[discid]
+            return self.disc
+
+        self.disc = {'id': discid, 'name': self.title, 'minlength': self.profile['mintitlelength'], 'titles': []}
+        _scan = '"%s" info -r disc:%s --minlength=%s' % \
+                (self.ripper_executable, self.driveid, self.profile['mintitlelength'])
+        with self.metrics.span('info disc', disc=self.title) as span:
+            _rv = self.pollSubprocess(self.ripper_executable, self.ripper_path, _scan, self.title)
+            span.set(exit=_rv, titles=len(self.disc['titles']))
+        if _rv != 0 or not self.disc['titles']: raise self.MakemkvExitsNotProperlyException(self.lastmessage)
+
+        for title in self.disc['titles']:
+            self.notifyLog('Title %s: %s, %s chapters, %s, %s streams' %
+                           (title['index'], datetime.timedelta(seconds=title['duration']), title.get('chapters', 0),
+                            fmt_size(title['size']), len(title['streams'])))
+
+        if discid:
+            self.disc['time'] = time.time()
+            # the drives of processDrives() share the lock, the cache is read again to keep their entries
+            with self.disclock:
+                cache = self.readDiscCache()
+                cache[discid] = self.disc
+                for _id in sorted(cache, key=lambda d: cache[d].get('time', 0))[:-DISCCACHESIZE]: del cache[_id]
+                if not os.path.exists(__profile__): os.makedirs(__profile__)
+                with open(os.path.join(__profile__, 'discs.json'), 'w', encoding='utf-8') as f: json.dump(cache, f)
+        return self.disc
+
+    def readDiscCache(self):
+        cachefile = os.path.join(__profile__, 'discs.json')
+        with self.disclock:
+            if not os.path.exists(cachefile): return dict()
+            try:
+                with open(cachefile, 'r', encoding='utf-8') as f: return json.load(f)
+            except ValueError:
+                self.notifyLog('Disc cache is corrupted, rebuild it', xbmc.LOGWARNING)
+                return dict()
+
+    def getMainTitle(self):
+        #
+        # the main feature is the longest title, the larger one if there are titles with the same duration
+        #
+        return max(self.disc['titles'], key=lambda title: (title['duration'], title['size']))['index']
+
+    def getDiscSize(self):
+        device = self.drives.get(int(self.driveid), dict()).get('device')
+        try:
+            with open(device, 'rb') as dev: return dev.seek(0, os.SEEK_END)
+        except (OSError, TypeError, ValueError):
+            return 0
+
+    def planJob(self, rips, encodes):
+        """
+        Estimates the space needed on the temp and destination volume and the processing time
+        :param rips: list of dicts with 'size' of titles to rip (or the whole disc for backups)
+        :param encodes: list of dicts with 'size' and 'duration' (0 if unknown) of titles/files to encode
+        :return: dict with 'temp', 'dest' (bytes) and 'time' (seconds)
+        """
+        mode = self.profile['mode']
+        direct = self.directoutput and (isLocal(self.profile['basefolder']) or mode == 3)
+        plan = {'temp': 0, 'dest': 0, 'time': 0}
+
+        riprate = self.stats.rate('rip', self.getDriveKey(), RIPRATE)
+        copyrate = self.stats.rate('copy', self.profile['basefolder'], COPYRATE)
+        ripsize = sum(rip['size'] for rip in rips)
+        plan['temp'] += ripsize
+        plan['time'] += ripsize / riprate
+        if mode == 0:
+            plan['dest'] += ripsize
+            plan['time'] += ripsize / copyrate
+        elif mode == 3:
+            plan['dest'] += ripsize
+            plan['time'] += ripsize / self.stats.rate('iso', 'mkisofs', ISORATE)
+            if not direct:
+                plan['temp'] += ripsize
+                plan['time'] += ripsize / copyrate
+
+        if mode in [1, 2]:
+            _res = MAXDIM.index(self.profile['resolution'])
+            _codec = CODEC.index(self.profile['codec'])
+            _rate = ENCODEDRATE[_res] * QUALITYFACTOR[QUALITY.index(self.profile['quality'])] * CODECFACTOR[_codec]
+            _measured = self.stats.rate('encode', self.getEncoderKey())
+            _jobs = min(self.encoderjobs, len(encodes)) if mode == 2 else 1
+            for encode in encodes:
+                duration = encode.get('duration') or encode['size'] / SOURCERATE
+                plan['dest'] += duration * _rate
+                if _measured:
+                    plan['time'] += encode['size'] / _measured / _jobs
+                else:
+                    plan['time'] += duration / (ENCODESPEED[_res] * CODECSPEED[_codec] * _jobs)
+                if not direct:
+                    plan['temp'] += duration * _rate
+                    plan['time'] += duration * _rate / copyrate
+        return plan
+
+    def checkDiskSpace(self, plan):
+        #
+        # compare the plan with the free space of each local volume, temp and destination may share a volume
+        #
+        volumes = dict()
+        for folder, need in [(self.tempfolder, plan['temp']), (self.profile['basefolder'], plan['dest'])]:
+            if not isLocal(folder) or not need: continue
+            try:
+                _device = os.stat(folder).st_dev
+                _free = shutil.disk_usage(folder).free
+            except OSError:
+                continue
+            if _device in volumes and not (self.directoutput and self.profile['mode'] > 0):
+                # the final file is moved (or linked) from the temp folder within the volume, see copyfile()
+                continue
+            volumes.setdefault(_device, {'folder': folder, 'need': 0, 'free': _free})['need'] += need
+
+        for volume in volumes.values():
+            self.notifyLog('Volume of \'%s\': %s needed, %s free' %
+                           (volume['folder'], fmt_size(volume['need']), fmt_size(volume['free'])))
+            if volume['need'] > volume['free']: return volume
+        return None
+
+    def preflight(self, rips, encodes):
+        #
+        # refuse jobs which don't fit on the volumes before the drive spins up, write directly to the
+        # destination if the temp folder is too small
+        #
+        plan = self.planJob(rips, encodes)
+        volume = self.checkDiskSpace(plan)
+        if volume and volume['folder'] == self.tempfolder and not self.directoutput and self.profile['mode'] > 0:
+            self.directoutput = True
+            plan = self.planJob(rips, encodes)
+            if self.checkDiskSpace(plan) is None:
+                self.notifyLog('Temp folder is too small, write directly to destination')
+                volume = None
+            else:
+                self.directoutput = False
+        if volume:
+            raise self.NotEnoughDiskSpaceException('%s needed, %s free on volume of \'%s\'' %
+                                                   (fmt_size(volume['need']), fmt_size(volume['free']),
+                                                    volume['folder']))
+
+        _time = datetime.timedelta(seconds=int(plan['time']))
+        self.notifyLog('Plan: %s in temp folder, %s in destination, estimated time %s' %
+                       (fmt_size(plan['temp']), fmt_size(plan['dest']), _time))
+        self.Dialog.notification(__addonname__, __LS__(30213) % _time, xbmcgui.NOTIFICATION_INFO)
+        return plan
+
+    def ripAndEncodePipelined(self):
+        #
+        # rip titles one by one and pass each finished title to the encode worker while the next title is ripped
+        #
+        self.getDiscInfo()
+
+        titles = [0]
+        if len(self.disc['titles']) > 1:
+            self.process_all = self.confirm(__LS__(30059), not self.selectedtitles)
+            self.notifyLog('Process multiple titles: %s' % self.process_all)
+            if self.process_all: titles = [title['index'] for title in self.disc['titles']]
+
+        if not self.process_all:
+            #
+            # only the main movie is wanted, there's nothing to overlap
+            #
+            return False
+
+        if self.planner: self.preflight(self.disc['titles'], self.disc['titles'])
+
+        title = self.cleanTitle(self.title)
+        destfolder = self.getDestFolder(title)
+
+        ripped = self.resumed['ripped'] if self.resumed and self.resumed['title'] == self.title else []
+        if ripped:
+            self.notifyLog('Titles %s are ripped already, skip them' % ripped)
+            titles = [idx for idx in titles if idx not in ripped]
+            self.setStage(self.job, 'rip', ripped=ripped)
+
+        jobs = queue.Queue()
+        errors = list()
+        worker = threading.Thread(target=self.encodeWorker, args=(jobs, errors), daemon=True)
+        worker.start()
+
+        try:
+            for count, idx in enumerate(titles, 1):
+                if errors: break
+                _before = set(xbmcvfs.listdir(self.tempfolder)[1])
+                self.ripper = '"%s" mkv -r --messages=-stdout --progress=-same --decrypt disc:%s %s ' \
+                              '--minlength=%s "%s"' % \
+                              (self.ripper_executable,
+                               self.driveid,
+                               idx,
+                               self.profile['mintitlelength'],
+                               self.tempfolder)
+                _title = [title for title in self.disc['titles'] if title['index'] == idx]
+                _rate = self.stats.rate('rip', self.getDriveKey())
+                _started = time.time()
+                with self.metrics.span('rip', title=idx, bytes=_title[0]['size'] if _title else None) as span:
+                    _rv = self.pollSubprocess(self.ripper_executable, self.ripper_path, self.ripper,
+                                              '%s (%s/%s)' % (self.title, count, len(titles)),
+                                              estimate=_title[0]['size'] / _rate if _rate and _title else None)
+                    span.set(exit=_rv)
+                if _rv != 0: raise self.MakemkvExitsNotProperlyException(self.lastmessage)
+
+                for rip in sorted(set(xbmcvfs.listdir(self.tempfolder)[1]) - _before):
+                    if os.path.splitext(rip)[1] not in self.extensions: continue
+                    if isLocal(self.tempfolder):
+                        self.stats.record('rip', self.getDriveKey(),
+                                          os.path.getsize(os.path.join(self.tempfolder, rip)), time.time() - _started)
+                    jobs.put(self.newJob('encode', src=rip, source=os.path.join(self.tempfolder, rip),
+                                         destfolder=destfolder, tmp='%s.%s' % (int(time.time()), idx),
+                                         destfile='%s - %02d.mkv' % (title, idx + 1)))
+                    self.notifyLog('Title %s ripped into \'%s\', queued for encoding' % (idx, rip))
+                # the title has its encode job now, a resumed rip job continues with the next title
+                self.setStage(self.job, 'rip', ripped=self.job.get('ripped', []) + [idx])
+
+            if self.eject:
+                xbmc.executebuiltin('EjectTray()')
+                self.notifyLog('Eject disc')
+        finally:
+            jobs.put(None)
+            worker.join()
+
+        if errors: raise errors[0]
+        return True
+
+    def createIso(self, job):
+        #
+        # Make ISO
+        #
+        add_opt = '' if OS == 'Windows' else '-allow-limited-size'
+        _size = folderSize(job['isofolder']) if isLocal(job['isofolder']) else 0
+        _rate = self.stats.rate('iso', 'mkisofs')
+        _estimate = _size / _rate if _rate and _size else None
+        _started = time.time()
+        if job.get('stream'):
+            #
+            # mkisofs writes the image to stdout, which is streamed directly into the VFS destination
+            #
+            self.mkiso = '"%s" -udf -R -J -input-charset utf-8 -iso-level 3 %s -V "%s" "%s"' \
+                         % (self.mkisofs_executable, add_opt, self.title.upper(), job['isofolder'])
+            with self.metrics.span('mkisofs', bytes=_size, stream=True) as span, \
+                    xbmcvfs.File(job['isofile'], 'w') as image:
+                _rv = self.pollSubprocess(self.mkisofs_executable, self.mkisofs_path, self.mkiso, self.title,
+                                          output=image, estimate=_estimate)
+                span.set(exit=_rv)
+        else:
+            self.mkiso = '"%s" -udf -R -J -input-charset utf-8 -iso-level 3 %s ' \
+                         '-V "%s" -o "%s" "%s"' \
+                         % (self.mkisofs_executable, add_opt, self.title.upper(), job['isofile'], job['isofolder'])
+
+            with self.metrics.span('mkisofs', bytes=_size) as span:
+                _rv = self.pollSubprocess(self.mkisofs_executable, self.mkisofs_path, self.mkiso, self.title,
+                                          estimate=_estimate)
+                span.set(exit=_rv)
+        if _rv != 0: raise self.MkisofsExitsNotProperlyException()
+        self.stats.record('iso', 'mkisofs', _size, time.time() - _started)
+
+        self.candidates = None
+        if job.get('direct'):
+            self.finishPart(job['isofile'])
+            self.setStage(job, 'done')
+
+        # remove ISO folder
+        if self.del_tf: self.rmdirsBackground(job['isofolder'])
+
+    def deliver(self, job):
+        self.buildDestFileAndFolder(title=self.title)
+        #
+        # RIP ONLY / BACKUP - WE ARE READY
+        #
+        self.notifyLog('Encoding of \'%s\' not required in this profile' % self.destfile)
+
+        if self.profile['mode'] == 0 and self.tempfolder == self.profile['basefolder']:
+            xbmcvfs.rename(os.path.join(self.tempfolder, self.src), os.path.join(self.tempfolder, self.destfile))
+            self.notifyLog('Temp and destination folder is identical, copy files isn\'t required.')
+            self.setStage(job, 'done')
+            return False
+
+        self.setStage(job, 'copy', copysrc=os.path.join(self.tempfolder, self.src),
+                      copydest=os.path.join(self.destfolder, self.destfile))
+        self.copyfile(job['copysrc'], job['copydest'])
+        self.setStage(job, 'done')
+        return True
+
+    def resumeJobs(self):
+        #
+        # continue unfinished jobs of the journal at the first stage which isn't completed
+        #
+        # finish the already ripped titles before a disc has to be ripped again
+        for job in sorted(self.journal.pending(), key=lambda j: j['stage'] == 'rip'):
+            self.profile = job['profile']
+            self.policy = self.getPolicy()
+            self.task = job['task']
+            self.title = job['title']
+            self.notifyLog('Resume job %s of task \'%s\' at stage \'%s\'' % (job['id'], self.task, job['stage']))
+
+            if job['stage'] == 'rip':
+                # an interrupted rip leaves incomplete files only, the disc has to be ripped again. Titles which
+                # are ripped completely (pipelined) have their own encode jobs and are skipped
+                self.setStage(job, 'done')
+                self.resumed = {'title': job['title'], 'ripped': job.get('ripped', [])}
+                self.title = None
+                try:
+                    self.process()
+                finally:
+                    self.resumed = None
+            elif job['stage'] == 'encode' and not os.path.exists(self.getSource(job)):
+                self.notifyLog('Source \'%s\' of job %s is gone, skip job' % (job['src'], job['id']), xbmc.LOGWARNING)
+                self.setStage(job, 'done')
+            elif job['stage'] == 'iso':
+                self.createIso(job)
+                if not job.get('direct'): self.deliver(job)
+            elif job['stage'] == 'encode':
+                self.encode(job)
+            elif job['stage'] == 'copy':
+                self.copyfile(job['copysrc'], job['copydest'], title=os.path.basename(job['copydest']))
+                if self.del_tf and job.get('src') and not job.get('keep'):
+                    self.delTempFolder(file=self.getSource(job))
+                self.setStage(job, 'done')
+
+        self.journal.purge()
+        if self.updatelib: xbmc.executebuiltin('UpdateLibrary(video)')
+
+    def ripDrive(self, jobs):
+        #
+        # rip the titles of the disc in drive [driveid] one by one into the temp folder of the drive and queue
+        # them for the encoders which are shared by all drives
+        #
+        self.getDiscInfo()
+        titles = [self.getMainTitle()] if self.selectedtitles else [title['index'] for title in self.disc['titles']]
+        if self.planner:
+            self.preflight([title for title in self.disc['titles'] if title['index'] in titles],
+                           [title for title in self.disc['titles'] if title['index'] in titles])
+
+        title = self.cleanTitle(self.title)
+        destfolder = self.getDestFolder(title)
+        self.ProgressBG.add(len(titles))
+        for idx in titles:
+            _before = set(xbmcvfs.listdir(self.tempfolder)[1])
+            self.ripper = '"%s" mkv -r --messages=-stdout --progress=-same --decrypt disc:%s %s ' \
+                          '--minlength=%s "%s"' % \
+                          (self.ripper_executable,
+                           self.driveid,
+                           idx,
+                           self.profile['mintitlelength'],
+                           self.tempfolder)
+            _title = [title for title in self.disc['titles'] if title['index'] == idx]
+            _rate = self.stats.rate('rip', self.getDriveKey())
+            _started = time.time()
+            with self.metrics.span('rip', drive=self.driveid, title=idx,
+                                   bytes=_title[0]['size'] if _title else None) as span:
+                _rv = self.pollSubprocess(self.ripper_executable, self.ripper_path, self.ripper,
+                                          '%s (%s/%s)' % (self.title, titles.index(idx) + 1, len(titles)),
+                                          estimate=_title[0]['size'] / _rate if _rate and _title else None)
+                span.set(exit=_rv)
+            if _rv != 0: raise self.MakemkvExitsNotProperlyException(self.lastmessage)
+            self.ProgressBG.finish()
+
+            for rip in sorted(set(xbmcvfs.listdir(self.tempfolder)[1]) - _before):
+                if os.path.splitext(rip)[1] not in self.extensions: continue
+                if isLocal(self.tempfolder):
+                    self.stats.record('rip', self.getDriveKey(),
+                                      os.path.getsize(os.path.join(self.tempfolder, rip)), time.time() - _started)
+                self.ProgressBG.add()
+                # the encoders work on the temp folder of all drives
+                jobs.put(self.newJob('encode', src=os.path.join(os.path.basename(self.tempfolder), rip),
+                                     source=os.path.join(self.tempfolder, rip),
+                                     destfolder=destfolder, tmp='%s.%s.%s' % (int(time.time()), self.driveid, idx),
+                                     destfile='%s.mkv' % title if len(titles) == 1 else
+                                     '%s - %02d.mkv' % (title, idx + 1)))
+                self.notifyLog('Title %s of drive %s ripped into \'%s\', queued for encoding' %
+                               (idx, self.driveid, rip))
+
+        if self.eject:
+            xbmc.executebuiltin('EjectTray()')
+            self.notifyLog('Eject disc')
+
+    def driveWorker(self, drive, jobs, errors, clean=False):
+        try:
+            if not xbmcvfs.exists(drive.tempfolder): xbmcvfs.mkdirs(drive.tempfolder)
+            if clean: drive.rmdirs(drive.tempfolder, force=True)
+            if self.profile['mode'] == 1:
+                drive.ripDrive(jobs)
+            else:
+                drive.process()
+                drive.ProgressBG.finish()
+        except Exception as e:
+            self.notifyLog('Processing of drive %s failed: %s' % (drive.driveid, traceback.format_exc()),
+                           xbmc.LOGERROR)
+            errors.append(e)
+
+    def processDrives(self):
+        #
+        # one rip pipeline per drive with a disc, each in its own temp subfolder. The rips of all drives are
+        # encoded by [encoderjobs] shared encoders
+        #
+        self.mediacheck = '"%s" info list -r' % self.ripper_executable
+        with self.metrics.span('info list') as span:
+            _rv = self.pollSubprocess(self.ripper_executable, self.ripper_path, self.mediacheck)
+            span.set(exit=_rv)
+
+        discs = sorted(idx for idx, drive in self.drives.items() if drive['name'])
+        if len(discs) < 2: return False
+        self.notifyLog('Discs found in %s drives: %s' %
+                       (len(discs), ', '.join(self.drives[idx]['name'] for idx in discs)))
+
+        # rip and encode: every title and every encode is an item (added by the drives), otherwise every disc
+        progress = MultiProgress(self.task, total=0 if self.profile['mode'] == 1 else len(discs))
+        jobs = queue.Queue()
+        errors = list()
+        encoders = list()
+        if self.profile['mode'] == 1:
+            for encoder in range(self.encoderjobs):
+                encoders.append(threading.Thread(target=self.encodeWorker, daemon=True,
+                                                 args=(jobs, errors, progress.job(__LS__(30201) % (encoder + 1)))))
+                encoders[-1].start()
+
+        drives = list()
+        for idx in discs:
+            drive = LoungeRipper()
+            for attribute in ['profile', 'policy', 'task', 'drives', 'journal', 'registry', 'stats', 'metrics',
+                              'encodercache', 'disclock', 'streamlock']:
+                setattr(drive, attribute, getattr(self, attribute))
+            drive.driveid = str(idx)
+            drive.title = self.drives[idx]['name']
+            drive.tempfolder = os.path.join(self.tempfolder, 'disc%s' % idx)
+            drive.ProgressBG = progress.job(__LS__(30226) % idx)
+            drive.process_all = False
+            drive.updatelib = False
+            # EjectTray() ejects the drive of Kodi only
+            drive.eject = self.eject and drive.driveid == str(self.driveid)
+            drives.append(drive)
+
+        # never delete without a user, the folders could contain rips which aren't encoded yet
+        clean = any(xbmcvfs.exists(drive.tempfolder) and drive.checkTempFolder() for drive in drives) and \
+            self.confirm(__LS__(30092), False)
+
+        rippers = list()
+        for drive in drives:
+            rippers.append(threading.Thread(target=self.driveWorker, args=(drive, jobs, errors, clean)))
+            rippers[-1].start()
+
+        for ripper in rippers: ripper.join()
+        for encoder in encoders: jobs.put(None)
+        for encoder in encoders: encoder.join()
+        progress.close()
+        if errors: raise errors[0]
+
+        self.Dialog.notification(__addonname__, __LS__(30049) % (__addonname__, self.task), xbmcgui.NOTIFICATION_INFO)
+        if self.updatelib: xbmc.executebuiltin('UpdateLibrary(video)')
+        return True
 
     def start(self):
 
         self.notifyLog('Engage Lounge Ripper %s on %s %s' % (__version__, OS, V))
         self.getUserProfiles()
         self.checkSystemSettings(self.profile['mode'])
+
+        try:
+            while True:
+                # processDrives() has listed the drives already if there aren't discs in two drives
+                listed = self.multidrive and self.profile['mode'] in [0, 1, 3]
+                if not (listed and self.processDrives()): self.process(listed=listed)
+                self.journal.purge()
+                #
+                # next disc with the same profile
+                #
+                if not (self.nextdisc and self.profile['mode'] in [0, 1, 3]): break
+                if not self.Dialog.yesno(__addonname__, __LS__(30206) % self.task): break
+                self.title = None
+                self.disc = None
+                self.process_all = None
+        finally:
+            self.logMetrics()
+
+        self.notifyLog('switch off Lounge Ripper')
+
+    def logMetrics(self):
+        if not self.metrics.enabled: return
+        for stage, count, seconds, size in self.metrics.summary():
+            self.notifyLog('Metrics (run %s): %s, %s x, %.1f s%s' %
+                           (self.metrics.run, stage, count, seconds,
+                            ', %s (%s/s)' % (fmt_size(size), fmt_size(size / max(seconds, 0.001))) if size else ''))
+
+    def process(self, listed=False):
+        """
+        :param listed: the drives are listed already (info list), the disc of drive [driveid] is known
+        """
         self.notifyLog('starting task \'%s\' (mode %s)' % (self.task, self.profile['mode']))
+        self.candidates = None
 
         isofolder = os.path.join(self.tempfolder, 'ISO')
         if self.profile['mode'] == 0 or self.profile['mode'] == 1 or self.profile['mode'] == 3:
@@ -429,18 +2530,50 @@ class LoungeRipper(object):
             # Check if media is present in drive [driveno]
             # raise self.MediaIsNotPresentException if isn't
 
-            self.mediacheck = '"%s" info list -r' % self.ripper_executable
-            _rv = self.pollSubprocess(self.ripper_executable, self.ripper_path, self.mediacheck)
+            if not listed:
+                self.mediacheck = '"%s" info list -r' % self.ripper_executable
+                with self.metrics.span('info list') as span:
+                    _rv = self.pollSubprocess(self.ripper_executable, self.ripper_path, self.mediacheck)
+                    span.set(exit=_rv)
 
             if not self.title: raise self.RemovableMediaNotPresentException()
 
             if self.checkTempFolder():
-                if self.Dialog.yesno(__addonname__, __LS__(30092), autoclose=60000): self.delTempFolder(force=True)
+                # never delete without a user, the folder could contain rips which aren't encoded yet
+                if self.confirm(__LS__(30092), False): self.delTempFolder(force=True)
+
+            self.job = self.newJob('rip')
+
+            if self.profile['mode'] == 1 and self.pipeline and self.ripAndEncodePipelined():
+                #
+                # RIP AND ENCODE PIPELINED - ALL TITLES ARE READY
+                #
+                self.setStage(self.job, 'done')
+                self.Dialog.notification(__addonname__, __LS__(30049) % (__addonname__, self.task),
+                                         xbmcgui.NOTIFICATION_INFO)
+                if self.updatelib: xbmc.executebuiltin('UpdateLibrary(video)')
+                return
+
+            titles = 'all'
+            if (self.selectedtitles or self.planner) and self.profile['mode'] in [0, 1]:
+                if self.disc is None: self.getDiscInfo()
+                _main = [title for title in self.disc['titles'] if title['index'] == self.getMainTitle()]
+                if self.selectedtitles:
+                    #
+                    # only the main feature is used, don't rip the other titles
+                    #
+                    titles = _main[0]['index']
+                    self.notifyLog('Rip main title %s only' % titles)
+                if self.planner: self.preflight(_main if self.selectedtitles else self.disc['titles'], _main)
 
-            self.ripper = '"%s" mkv -r --messages=-stdout --progress=-same --decrypt disc:%s all ' \
+            if self.planner and self.profile['mode'] == 3 and self.getDiscSize():
+                self.preflight([{'size': self.getDiscSize()}], [])
+
+            self.ripper = '"%s" mkv -r --messages=-stdout --progress=-same --decrypt disc:%s %s ' \
                           '--minlength=%s "%s"' % \
                           (self.ripper_executable,
                            self.driveid,
+                           titles,
                            self.profile['mintitlelength'],
                            self.tempfolder)
 
@@ -449,41 +2582,44 @@ class LoungeRipper(object):
                 self.ripper = '"%s" backup -r --decrypt --cache=16 --noscan --progress=-same disc:%s "%s"'\
                               % (self.ripper_executable, self.driveid, isofolder)
 
-            _rv = self.pollSubprocess(self.ripper_executable, self.ripper_path, self.ripper, self.title)
-            if _rv != 0: raise self.MakemkvExitsNotProperlyException(self.lastmessage)
+            _size = sum(title['size'] for title in self.disc['titles'] if titles in ['all', title['index']]) \
+                if self.disc is not None and self.profile['mode'] != 3 else self.getDiscSize()
+            _rate = self.stats.rate('rip', self.getDriveKey())
+            _started = time.time()
+            with self.metrics.span('rip', title=titles, bytes=_size) as span:
+                _rv = self.pollSubprocess(self.ripper_executable, self.ripper_path, self.ripper, self.title,
+                                          estimate=_size / _rate if _rate and _size else None)
+                span.set(exit=_rv)
+                if _rv != 0: raise self.MakemkvExitsNotProperlyException(self.lastmessage)
+                self.candidates = None
+                if isLocal(self.tempfolder):
+                    _size = folderSize(isofolder) if self.profile['mode'] == 3 else \
+                        sum(os.path.getsize(os.path.join(self.tempfolder, file))
+                            for file in xbmcvfs.listdir(self.tempfolder)[1])
+                    self.stats.record('rip', self.getDriveKey(), _size, time.time() - _started)
+                    span.set(bytes=_size)
             if self.eject:
                 xbmc.executebuiltin('EjectTray()')
                 self.notifyLog('Eject disc')
 
         if self.profile['mode'] == 0 or self.profile['mode'] == 3:
             if self.profile['mode'] == 3:
-                #
-                # Make ISO
-                #
-                isofile = os.path.join(self.tempfolder, self.title + '.iso')
-                add_opt = '' if OS == 'Windows' else '-allow-limited-size'
-                self.mkiso = '"%s" -udf -R -J -input-charset utf-8 -iso-level 3 %s ' \
-                             '-V "%s" -o "%s" "%s"' \
-                             % (self.mkisofs_executable, add_opt, self.title.upper(), isofile, isofolder)
-
-                _rv = self.pollSubprocess(self.mkisofs_executable, self.mkisofs_path, self.mkiso, self.title)
-                if _rv != 0: self.MkisofsExitsNotProperlyException()
-
-                # remove ISO folder
-                if self.del_tf: self.rmdirs(isofolder, force=True)
-
-            self.buildDestFileAndFolder(title=self.title)
-            #
-            # RIP ONLY / BACKUP - WE ARE READY
-            #
-            self.notifyLog('Encoding of \'%s\' not required in this profile' % self.destfile)
-
-            if self.profile['mode'] == 0 and self.tempfolder == self.profile['basefolder']:
-                xbmcvfs.rename(os.path.join(self.tempfolder, self.src), os.path.join(self.tempfolder, self.destfile))
-                self.notifyLog('Temp and destination folder is identical, copy files isn\'t required.')
-                return
+                destfolder = self.getDestFolder(self.cleanTitle(self.title))
+                if self.directoutput and not isLocal(destfolder):
+                    # mkisofs can't write to VFS destinations, the image is streamed from its stdout
+                    self.setStage(self.job, 'iso', title=self.title, isofolder=isofolder, direct=True, stream=True,
+                                  isofile=os.path.join(destfolder, self.cleanTitle(self.title) + '.iso.part'))
+                elif self.isDirectOutput(destfolder):
+                    # write the image as partial file into the destination folder, copying isn't required
+                    self.setStage(self.job, 'iso', title=self.title, isofolder=isofolder, direct=True,
+                                  isofile=os.path.join(destfolder, self.cleanTitle(self.title) + '.iso.part'))
+                else:
+                    self.setStage(self.job, 'iso', title=self.title, isofolder=isofolder,
+                                  isofile=os.path.join(self.tempfolder, self.title + '.iso'))
+                self.createIso(self.job)
+                if self.job.get('direct'): self.destfile = os.path.basename(self.job['isofile'])[:-len('.part')]
 
-            self.copyfile(os.path.join(self.tempfolder, self.src), os.path.join(self.destfolder, self.destfile))
+            if not self.job.get('direct') and not self.deliver(self.job): return
 
         while True:
             if self.profile['mode'] == 1 or self.profile['mode'] == 2:
@@ -496,27 +2632,32 @@ class LoungeRipper(object):
                     #
                     self.process_all = False
 
+                _first = self.candidates is None
                 self.buildDestFileAndFolder()
+                if self.src is None: break
+                if _first and self.planner and self.profile['mode'] == 2:
+                    _sources = [{'size': _fsize} for _fsize in
+                                [self.srcsize] + ([c['size'] for c in self.candidates] if self.process_all else [])]
+                    self.preflight([], _sources)
+
+                if self.profile['mode'] == 2 and self.process_all and self.encoderjobs > 1:
+                    #
+                    # ENCODE ONLY - ALL FILES CONCURRENTLY
+                    #
+                    self.encodePool()
+                    self.Dialog.notification(__addonname__, __LS__(30049) % (__addonname__, self.task),
+                                             xbmcgui.NOTIFICATION_INFO)
+                    break
 
                 self.tmp = str(int(time.time()))
-                self.encoder = '"%s" -i "%s" -o "%s" -f mkv --decomb fast -N %s --native-dub -m ' \
-                               '-Z "%s MKV 2160p60" -s 1 %s %s %s %s 2>&1' % \
-                               (self.encoder_executable,
-                                os.path.join(self.tempfolder, self.src),
-                                os.path.join(self.tempfolder, self.tmp),
-                                self.lang3,
-                                self.profile['codec'],
-                                self.profile['foreignaudio'],
-                                self.profile['quality'],
-                                self.profile['resolution'],
-                                self.profile['additionalhandbrakeargs'])
-
-                _rv = self.pollSubprocess(self.encoder_executable, self.encoder_path, self.encoder, self.destfile)
-                if _rv != 0:
-                    raise self.HandBrakeCLIExitsNotProperlyException()
-
-                self.copyfile(os.path.join(self.tempfolder, self.tmp), os.path.join(self.destfolder, self.destfile))
-                if self.del_tf: self.delTempFolder(force=True, file=os.path.join(self.tempfolder, self.src))
+                if self.profile['mode'] == 1:
+                    # the rip job continues as encoding job
+                    self.setStage(self.job, 'encode', src=self.src, source=self.srcpath,
+                                  destfolder=self.destfolder, destfile=self.destfile, tmp=self.tmp)
+                else:
+                    self.job = self.newJob('encode', src=self.src, source=self.srcpath, keep=self.sources is not None,
+                                           destfolder=self.destfolder, destfile=self.destfile, tmp=self.tmp)
+                self.encode(self.job)
                 #
                 # READY
                 #
@@ -524,7 +2665,6 @@ class LoungeRipper(object):
             if self.process_all is None or not self.process_all: break
 
         if self.updatelib: xbmc.executebuiltin('UpdateLibrary(video)')
-        self.notifyLog('switch off Lounge Ripper')
 
 ##########################################################################################################
 #                                                                                                        #
@@ -533,50 +2673,68 @@ class LoungeRipper(object):
 ##########################################################################################################
 
 
-Ripper = LoungeRipper()
-
-try:
-    Ripper.start()
-except Ripper.NoProfileEnabledException:
-    ok = Ripper.Dialog.ok(__addonname__, __LS__(30050))
-    Ripper.notifyLog('No profiles enabled', level=xbmc.LOGERROR)
-except Ripper.NoProfileSelectedException:
-    Ripper.notifyLog('No profile selected, exit %s' % __addonname__)
-except Ripper.SystemSettingUndefinedException:
-    ok = Ripper.Dialog.ok(__addonname__, __LS__(30052))
-    Ripper.notifyLog('One or more system settings are invalid', level=xbmc.LOGERROR)
-except Ripper.CouldNotFindValidFilesException:
-    ok = Ripper.Dialog.ok(__addonname__, __LS__(30056) % Ripper.tempfolder)
-    Ripper.notifyLog('Could not find any valid files in %s' % Ripper.tempfolder, level=xbmc.LOGERROR)
-except Ripper.RemovableMediaNotPresentException:
-    Ripper.notifyLog('Could not detect removable media or media isn\'t present or not readable', level=xbmc.LOGERROR)
-    ok = Ripper.Dialog.ok(__addonname__, __LS__(30057))
-except Ripper.MakemkvReportsMediumErrorException:
-    ok = Ripper.Dialog.ok(__addonname__, __LS__(30069))
-    Ripper.notifyLog('MakeMKV has reported a medium error', level=xbmc.LOGERROR)
-except Ripper.MakemkvExitsNotProperlyException:
-    ok = Ripper.Dialog.ok(__addonname__, __LS__(30053))
-    Ripper.notifyLog('%s don\'t work as expected, possibly too old, '
-                     'key invalid, aborted by user '
-                     'or another error has occured: %s' % (Ripper.ripper_executable, Ripper.lastmessage),
-                     level=xbmc.LOGERROR)
-except Ripper.HandBrakeCLIExitsNotProperlyException:
-    ok = Ripper.Dialog.ok(__addonname__, __LS__(30054))
-    Ripper.notifyLog('An error occured while encoding with %s' % Ripper.encoder_executable, level=xbmc.LOGERROR)
-except Ripper.MkisofsExitsNotProperlyException:
-    ok = Ripper.Dialog.ok(__addonname__, __LS__(30062))
-    Ripper.notifyLog('An error occured while processing %s' % Ripper.mkisofs_executable, level=xbmc.LOGERROR)
-except Ripper.SubProcessAbortException:
-    Ripper.notifyLog('Rip/Encode/Backup processes received an abort signal')
-    Ripper.Dialog.notification(__addonname__, __LS__(30013), xbmcgui.NOTIFICATION_ERROR)
-except Ripper.KillCurrentProcessCalledException:
-    Ripper.notifyLog('All current ripper and encoders terminated')
-except Ripper.CleanUpTempFolderException:
-    Ripper.Dialog.notification(__addonname__, __LS__(30046) % Ripper.tempfolder, xbmcgui.NOTIFICATION_INFO)
-    Ripper.notifyLog('Temporary folder %s cleaned' % Ripper.tempfolder)
-except Ripper.CurrentProcessAbortedException:
-    Ripper.Dialog.notification(__addonname__, __LS__(30058), xbmcgui.NOTIFICATION_ERROR)
-    Ripper.notifyLog('Last operation could not completed. Check results', level=xbmc.LOGERROR)
-except Exception as e:
-    Ripper.notifyLog('An error has occurred: %s' % traceback.format_exc(), xbmc.LOGERROR)
-del Ripper
+def run(Ripper, task):
+    """
+    Runs task (e.g. Ripper.start) and reports its errors
+    :return: True if task is completed without errors
+    """
+    try:
+        task()
+        return True
+    except Ripper.NoProfileEnabledException:
+        ok = Ripper.Dialog.ok(__addonname__, __LS__(30050))
+        Ripper.notifyLog('No profiles enabled', level=xbmc.LOGERROR)
+    except Ripper.NoProfileSelectedException:
+        Ripper.notifyLog('No profile selected, exit %s' % __addonname__)
+    except Ripper.SystemSettingUndefinedException:
+        ok = Ripper.Dialog.ok(__addonname__, __LS__(30052))
+        Ripper.notifyLog('One or more system settings are invalid', level=xbmc.LOGERROR)
+    except Ripper.CouldNotFindValidFilesException:
+        ok = Ripper.Dialog.ok(__addonname__, __LS__(30056) % Ripper.tempfolder)
+        Ripper.notifyLog('Could not find any valid files in %s' % Ripper.tempfolder, level=xbmc.LOGERROR)
+    except Ripper.RemovableMediaNotPresentException:
+        Ripper.notifyLog('Could not detect removable media or media isn\'t present or not readable', level=xbmc.LOGERROR)
+        ok = Ripper.Dialog.ok(__addonname__, __LS__(30057))
+    except Ripper.MakemkvReportsMediumErrorException:
+        ok = Ripper.Dialog.ok(__addonname__, __LS__(30069))
+        Ripper.notifyLog('MakeMKV has reported a medium error', level=xbmc.LOGERROR)
+    except Ripper.MakemkvExitsNotProperlyException:
+        ok = Ripper.Dialog.ok(__addonname__, __LS__(30053))
+        Ripper.notifyLog('%s don\'t work as expected, possibly too old, '
+                         'key invalid, aborted by user '
+                         'or another error has occured: %s' % (Ripper.ripper_executable, Ripper.lastmessage),
+                         level=xbmc.LOGERROR)
+    except Ripper.HandBrakeCLIExitsNotProperlyException:
+        ok = Ripper.Dialog.ok(__addonname__, __LS__(30054))
+        Ripper.notifyLog('An error occured while encoding with %s' % Ripper.encoder_executable, level=xbmc.LOGERROR)
+    except Ripper.MkisofsExitsNotProperlyException:
+        ok = Ripper.Dialog.ok(__addonname__, __LS__(30062))
+        Ripper.notifyLog('An error occured while processing %s' % Ripper.mkisofs_executable, level=xbmc.LOGERROR)
+    except Ripper.SubProcessAbortException:
+        Ripper.notifyLog('Rip/Encode/Backup processes received an abort signal')
+        Ripper.Dialog.notification(__addonname__, __LS__(30013), xbmcgui.NOTIFICATION_ERROR)
+    except Ripper.KillCurrentProcessCalledException:
+        Ripper.notifyLog('All current ripper and encoders terminated')
+    except Ripper.ResumeJobsCompletedException:
+        Ripper.Dialog.notification(__addonname__, __LS__(30207), xbmcgui.NOTIFICATION_INFO)
+        Ripper.notifyLog('All unfinished jobs are resumed')
+    except Ripper.NotEnoughDiskSpaceException as e:
+        ok = Ripper.Dialog.ok(__addonname__, __LS__(30212) % str(e))
+        Ripper.notifyLog('Job refused, not enough disk space: %s' % str(e), level=xbmc.LOGERROR)
+    except Ripper.ShowStatisticsCalledException:
+        Ripper.notifyLog('Statistics shown')
+    except Ripper.CleanUpTempFolderException:
+        Ripper.Dialog.notification(__addonname__, __LS__(30046) % Ripper.tempfolder, xbmcgui.NOTIFICATION_INFO)
+        Ripper.notifyLog('Temporary folder %s cleaned' % Ripper.tempfolder)
+    except Ripper.CurrentProcessAbortedException:
+        Ripper.Dialog.notification(__addonname__, __LS__(30058), xbmcgui.NOTIFICATION_ERROR)
+        Ripper.notifyLog('Last operation could not completed. Check results', level=xbmc.LOGERROR)
+    except Exception as e:
+        Ripper.notifyLog('An error has occurred: %s' % traceback.format_exc(), xbmc.LOGERROR)
+    return False
+
+
+if __name__ == '__main__':
+    Ripper = LoungeRipper()
+    run(Ripper, Ripper.start)
+    del Ripper
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Encoder worker for the chunked encoding of LoungeRipper. Runs without Kodi on any machine with HandBrakeCLI
+which could access the temp folder of LoungeRipper (shared or mounted folder, see --map).
+
+Every connection encodes a single chunk: the client sends one JSON line with 'input', 'output' and the list of
+'options' of HandBrakeCLI, the worker returns the output lines of HandBrakeCLI and finally 'EXIT:<status>'.
+The encoder process is killed if the connection is lost.
+
+    python3 encodeworker.py --handbrake /usr/bin/HandBrakeCLI --listen 0.0.0.0 --port 8766 \\
+        --map /home/kodi/tmp=/mnt/kodi/tmp
+"""
+import argparse
+import json
+import socketserver
+import subprocess
+import sys
+import threading
+
+# default port, the same as WORKERPORT of the addon
+WORKERPORT = 8766
+
+
+def mapPath(path, mappings):
+    """
+    :param path: path of the client
+    :param mappings: list of tuples (path prefix of the client, path prefix of the worker)
+    :return: path on this machine
+    """
+    for client, local in mappings:
+        if path.startswith(client): return local + path[len(client):]
+    return path
+
+
+class EncoderHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        try:
+            job = json.loads(self.rfile.readline().decode('utf-8'))
+            options = [str(option) for option in job['options']]
+            command = [self.server.handbrake,
+                       '-i', mapPath(job['input'], self.server.mappings),
+                       '-o', mapPath(job['output'], self.server.mappings)] + options
+        except (ValueError, KeyError, TypeError) as e:
+            self.send('ERROR:invalid job: %s' % str(e))
+            self.send('EXIT:-1')
+            return
+
+        with self.server.slots:
+            self.server.log('encode %s' % ' '.join(command))
+            proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                    encoding='utf-8', errors='replace')
+            try:
+                #
+                # HandBrakeCLI writes its progress with carriage returns, every update is sent as a line
+                #
+                line = ''
+                while True:
+                    char = proc.stdout.read(1)
+                    if not char: break
+                    if char in '\r\n':
+                        if line: self.send(line)
+                        line = ''
+                    else:
+                        line += char
+                if line: self.send(line)
+                self.send('EXIT:%s' % proc.wait())
+                self.server.log('finished with status %s' % proc.returncode)
+            except OSError as e:
+                self.server.log('connection lost: %s' % str(e))
+            finally:
+                if proc.poll() is None:
+                    proc.kill()
+                    proc.wait()
+
+    def send(self, line):
+        self.wfile.write((line + '\n').encode('utf-8'))
+        self.wfile.flush()
+
+
+class EncoderWorker(socketserver.ThreadingTCPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, handbrake, mappings, jobs=1, verbose=False):
+        super(EncoderWorker, self).__init__(address, EncoderHandler)
+        self.handbrake = handbrake
+        self.mappings = mappings
+        self.slots = threading.Semaphore(jobs)
+        self.verbose = verbose
+
+    def log(self, message):
+        if self.verbose: sys.stderr.write('[encodeworker] %s\n' % message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Encoder worker for the chunked encoding of LoungeRipper')
+    parser.add_argument('--handbrake', default='HandBrakeCLI', help='HandBrakeCLI executable')
+    parser.add_argument('--listen', default='127.0.0.1',
+                        help='address to listen on, use 0.0.0.0 in a trusted network only (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=WORKERPORT, help='port (default: %(default)s)')
+    parser.add_argument('--jobs', type=int, default=1, help='concurrent encoder processes (default: %(default)s)')
+    parser.add_argument('--map', action='append', default=[], metavar='CLIENT=LOCAL',
+                        help='path prefix of the client and its local path, could repeated')
+    parser.add_argument('--verbose', action='store_true', help='log the jobs to stderr')
+    args = parser.parse_args()
+
+    mappings = [tuple(mapping.split('=', 1)) for mapping in args.map if '=' in mapping]
+    server = EncoderWorker((args.listen, args.port), args.handbrake, mappings, max(1, args.jobs), args.verbose)
+    server.log('listening on %s:%s' % server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+import os
+import time
+import json
+import xbmc
+import xbmcgui
+
+from default import LoungeRipper, run, isLocal, parsePath, reloadSettings, __addonID__, __profile__
+
+# seconds between two checks of the drive and of the watch folder
+DISCINTERVAL = 2
+WATCHINTERVAL = 10
+
+
+class UnattendedDialog(xbmcgui.Dialog):
+    """
+    Dialog of the autorun service: messages are shown as notification and questions are answered with 'no',
+    so there's nothing which waits for a user
+    """
+
+    def ok(self, heading, message):
+        self.notification(heading, message, xbmcgui.NOTIFICATION_ERROR)
+        return True
+
+    def yesno(self, heading, message, *args, **kwargs):
+        return False
+
+
+class WatchFolder(object):
+    """
+    Detects new files in a folder. A file is ready if its size and modification time haven't changed since the
+    last poll, so files which are copied into the folder are not used before they are complete. Processed files
+    (name, size, modification time) are kept in [file], so they aren't encoded again after a restart
+    """
+
+    def __init__(self, folder, extensions, file):
+        self.folder = folder
+        self.extensions = extensions
+        self.file = file
+        self.snapshot = dict()
+        self.done = self.read()
+
+    def read(self):
+        if not os.path.exists(self.file): return set()
+        try:
+            with open(self.file, 'r', encoding='utf-8') as f:
+                return set(tuple(item) for item in json.load(f).get(self.folder, []))
+        except (ValueError, AttributeError):
+            return set()
+
+    def write(self):
+        try:
+            with open(self.file, 'r', encoding='utf-8') as f: folders = json.load(f)
+        except (OSError, ValueError):
+            folders = dict()
+        # files which are removed from the folder are forgotten
+        folders[self.folder] = [item for item in sorted(self.done) if item[0] in self.snapshot]
+        if not os.path.exists(os.path.dirname(self.file)): os.makedirs(os.path.dirname(self.file))
+        with open(self.file, 'w', encoding='utf-8') as f: json.dump(folders, f)
+
+    def scan(self):
+        files = dict()
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if entry.is_file() and os.path.splitext(entry.name)[1] in self.extensions:
+                    files[entry.name] = (entry.stat().st_size, int(entry.stat().st_mtime))
+        return files
+
+    def poll(self):
+        """
+        :return: list of new files which are unchanged since the last poll
+        """
+        if not os.path.isdir(self.folder): return list()
+        snapshot = self.scan()
+        stable = [file for file, item in sorted(snapshot.items())
+                  if self.snapshot.get(file) == item and (file,) + item not in self.done]
+        self.snapshot = snapshot
+        return stable
+
+    def processed(self, files):
+        self.done.update((file,) + self.snapshot[file] for file in files if file in self.snapshot)
+        self.write()
+
+
+class AutorunService(xbmc.Monitor):
+    """
+    Starts a profile if a disc is inserted and an encode only profile if there are new files in the watch folder
+    """
+
+    def __init__(self):
+        super(AutorunService, self).__init__()
+        self.autorun = False
+        self.discprofile = None
+        self.watchfolder = None
+        self.watchprofile = None
+        self.getSettings()
+
+    def notifyLog(self, message, level=xbmc.LOGDEBUG):
+        xbmc.log('[%s] %s' % (__addonID__, message), level)
+
+    def getSettings(self):
+        __addon__ = reloadSettings()
+        self.autorun = True if __addon__.getSetting('autorun').upper() == 'TRUE' else False
+        self.discprofile = 'p%s_' % (__addon__.getSetting('autorunprofile') or '1')
+        self.watchfolder = parsePath(__addon__.getSetting('watchfolder')) if __addon__.getSetting('watchfolder') else None
+        if self.watchfolder is not None and not isLocal(self.watchfolder):
+            # HandBrakeCLI reads the sources directly, it can't open VFS urls (smb://, nfs://, ...)
+            self.notifyLog('Watch folder \'%s\' isn\'t a local folder, disabled' % self.watchfolder, xbmc.LOGERROR)
+            self.watchfolder = None
+        self.watchprofile = 'p%s_' % (__addon__.getSetting('watchprofile') or '1')
+
+    def onSettingsChanged(self):
+        self.getSettings()
+        self.notifyLog('Settings changed: autorun %s, watch folder %s' % (self.autorun, self.watchfolder))
+
+    @staticmethod
+    def hasDisc():
+        return xbmc.getCondVisibility('System.HasMediaDVD')
+
+    def start(self, profile, sources=None):
+        """
+        :param sources: new files of the watch folder
+        :return: True if the profile has run without errors, files of the watch folder are done only then
+        """
+        __addon__ = reloadSettings()
+        Ripper = LoungeRipper()
+        if __addon__.getSetting(profile + 'enabled') != 'true':
+            self.notifyLog('Profile %s for autorun isn\'t enabled' % profile[:-1], xbmc.LOGERROR)
+            return False
+        if sources is not None and __addon__.getSetting(profile + 'mode') != '2':
+            self.notifyLog('Profile %s of the watch folder isn\'t an encode only profile' % profile[:-1],
+                           xbmc.LOGERROR)
+            return False
+        if Ripper.getProcessPIDs():
+            self.notifyLog('Ripper, encoder or mkisofs active, autorun skipped')
+            return False
+        Ripper.Dialog = UnattendedDialog()
+        return run(Ripper, lambda: Ripper.autorun(profile, sources=sources))
+
+    def run(self):
+        self.notifyLog('Autorun service started')
+        # a disc which is already inserted at startup isn't processed
+        disc = self.hasDisc()
+        watch = None
+        _nextwatch = 0
+        while not self.waitForAbort(DISCINTERVAL):
+            if self.autorun:
+                if self.hasDisc() and not disc:
+                    self.notifyLog('Disc inserted, start profile %s' % self.discprofile[:-1])
+                    self.start(self.discprofile)
+                disc = self.hasDisc()
+
+            if self.watchfolder is None or time.time() < _nextwatch: continue
+            if watch is None or watch.folder != self.watchfolder:
+                watch = WatchFolder(self.watchfolder, LoungeRipper().extensions,
+                                    os.path.join(__profile__, 'watched.json'))
+            files = watch.poll()
+            if files:
+                self.notifyLog('New files %s in \'%s\', start profile %s' %
+                               (files, self.watchfolder, self.watchprofile[:-1]))
+                if self.start(self.watchprofile, sources=[os.path.join(self.watchfolder, file) for file in files]):
+                    watch.processed(files)
+            _nextwatch = time.time() + WATCHINTERVAL
+        self.notifyLog('Autorun service stopped')
+
+
+if __name__ == '__main__':
+    AutorunService().run()